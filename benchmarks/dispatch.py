@@ -0,0 +1,119 @@
+"""dp.feed_update orqali soniyasiga nechta update qayta ishlanishini o'lchash
+
+Ishga tushirish (loyiha papkasidan):
+    python benchmarks/dispatch.py [updatelar_soni]
+
+Telegramga so'rov yuborilmaydi: bot sessiyasi javoblarni darhol qaytaradigan
+soxta sessiya bilan almashtiriladi, baza vaqtinchalik faylda yaratiladi.
+Foydalanuvchi va admin xabarlari aralashmasi yuboriladi.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault('BOT_TOKEN', '123456:BENCHMARK')
+os.environ.setdefault('DB_PATH', os.path.join(_tmp, 'bench.db'))
+# Ish yuki bir necha foydalanuvchidan minglab xabar: flood himoyasi ularni handlergacha
+# yetkazmay tashlardi. Middleware ishlaydi, lekin hech narsani rad etmaydi
+os.environ.setdefault('THROTTLE_LIMIT', '100000000')
+os.environ.setdefault('SUBSCRIPTION_CHECK_LIMIT', '100000000')
+
+from aiogram import types
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import CopyMessage, GetChat, GetChatMember, GetMe, SendMediaGroup
+
+import main
+
+ADMIN_ID = main.ADMIN_IDS[0]
+_ids = itertools.count(1)
+
+
+def _message(chat_id: int, text: str = None) -> types.Message:
+    return types.Message(
+        message_id=next(_ids), date=datetime.now(), chat=types.Chat(id=chat_id, type='private'), text=text
+    )
+
+
+class FakeSession(BaseSession):
+    """Har bir so'rovga darhol muvaffaqiyatli javob"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b''
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        if isinstance(method, GetChatMember):
+            return types.ChatMemberMember(user=types.User(id=method.user_id, is_bot=False, first_name='u'))
+        if isinstance(method, GetChat):
+            return types.Chat(id=-100, type='channel')
+        if isinstance(method, GetMe):
+            return types.User(id=123456, is_bot=True, first_name='bot')
+        if isinstance(method, CopyMessage):
+            return types.MessageId(message_id=next(_ids))
+        if isinstance(method, SendMediaGroup):
+            return [_message(method.chat_id) for _ in method.media]
+        if hasattr(method, 'chat_id'):
+            return _message(method.chat_id).as_(bot)
+        return True
+
+
+def make_update(user_id: int, text: str) -> types.Update:
+    user = types.User(id=user_id, is_bot=False, first_name='Ali')
+    message = types.Message(
+        message_id=next(_ids), date=datetime.now(), chat=types.Chat(id=user_id, type='private'),
+        from_user=user, text=text
+    )
+    return types.Update(update_id=next(_ids), message=message)
+
+
+# Oddiy foydalanuvchilar ko'p, admin kam
+WORKLOAD = [
+    (1001, '1'),
+    (1002, '1'),
+    (1003, '📝 Kino kodini kiritish'),
+    (1004, '999'),
+    (1005, '🔙 Asosiy menyu'),
+    (1006, '1'),
+    (ADMIN_ID, '📢 Kanallar boshqaruvi'),
+    (ADMIN_ID, '🔙 Orqaga'),
+]
+
+
+async def run(count: int):
+    session = FakeSession()
+    main.bot.session = session
+    await main.db.connect()
+    await main.db.add_movie('Titanic', 'Romantik film', 'FILE_ID')
+    updates = [make_update(*WORKLOAD[i % len(WORKLOAD)]) for i in range(count)]
+
+    # Isitish: kanallar aniqlanadi, keshlar to'ladi
+    for update in updates[:len(WORKLOAD) * 4]:
+        await main.dp.feed_update(main.bot, update)
+
+    session.calls = 0
+    start = time.perf_counter()
+    for update in updates:
+        await main.dp.feed_update(main.bot, update)
+    elapsed = time.perf_counter() - start
+
+    print(f"{count} ta update: {elapsed:.2f} s, {count / elapsed:.0f} update/s, "
+          f"{elapsed / count * 1e6:.0f} mks/update, {session.calls / count:.2f} API so'rov/update")
+    await main.db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000))
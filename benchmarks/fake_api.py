@@ -0,0 +1,197 @@
+"""Yuklama testi uchun soxta Telegram Bot API server (aiohttp)
+
+Alohida ishga tushirish:
+    python benchmarks/fake_api.py --port 8081 --latency 0.05 --error-rate 0.01
+
+Botni unga ulash: BOT_API_URL=http://127.0.0.1:8081 python main.py
+
+getUpdates, sendMessage, sendVideo, getChat, getChatMember, getFile va copyMessage
+to'liq javob qaytaradi; qolgan metodlar (answerCallbackQuery, deleteWebhook
+va h.k.) uchun `true` qaytariladi.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_ID = 123456
+
+
+class FakeTelegramAPI:
+    """Soxta Bot API
+
+    latency: har bir javobdan oldingi kutish (soniya), jitter: unga qo'shiladigan tasodifiy qism,
+    error_rate: 429 (retry_after) qaytarish ehtimoli, member_status: getChatMember javobi
+    ("member", "left" yoki "administrator").
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 retry_after: int = 1, member_status: str = 'member'):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.member_status = member_status
+        self.calls = Counter()
+        self.errors = 0
+        self.on_send = None
+        self._updates = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    def push_update(self, update: dict) -> int:
+        """Botga yangi update berish (keyingi getUpdates javobida keladi)"""
+        update_id = next(self._update_ids)
+        self._updates.append({'update_id': update_id, **update})
+        self._new_updates.set()
+        return update_id
+
+    def push_message(self, user_id: int, text: str) -> int:
+        user = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}', 'username': f'user{user_id}'}
+        return self.push_update({'message': {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private', 'first_name': user['first_name']},
+            'from': user,
+            'text': text,
+        }})
+
+    def _message(self, chat_id, **fields) -> dict:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            **fields
+        }
+
+    async def _get_updates(self, params: dict):
+        offset = int(params.get('offset') or 0)
+        timeout = float(params.get('timeout') or 0)
+        # Tasdiqlangan (offset dan kichik) updatelar o'chiriladi
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get('limit') or 100)
+        return self._updates[:limit]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        params = dict(await request.post())
+        self.calls[method] += 1
+
+        if method == 'getupdates':
+            return self._ok(await self._get_updates(params))
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after},
+            })
+
+        chat_id = params.get('chat_id')
+        if chat_id is not None and self.on_send is not None and method.startswith(('send', 'copy')):
+            self.on_send(int(chat_id), method)
+
+        if method == 'getme':
+            return self._ok({'id': BOT_ID, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'})
+        if method == 'getchat':
+            username = str(chat_id).lstrip('@')
+            return self._ok({'id': -1000000000000 - abs(hash(username)) % 10 ** 9, 'type': 'channel',
+                             'title': username, 'username': username})
+        if method == 'getchatmember':
+            user = {'id': int(params['user_id']), 'is_bot': False, 'first_name': 'User'}
+            return self._ok(self._chat_member(user))
+        if method == 'getfile':
+            return self._ok({'file_id': params.get('file_id', ''), 'file_unique_id': 'u'})
+        if method == 'copymessage':
+            return self._ok({'message_id': next(self._message_ids)})
+        if method == 'sendmessage':
+            return self._ok(self._message(chat_id, text=params.get('text', '')))
+        if method == 'sendvideo':
+            return self._ok(self._message(chat_id, video={
+                'file_id': params.get('video', ''), 'file_unique_id': 'u', 'width': 1, 'height': 1, 'duration': 1
+            }, caption=params.get('caption')))
+        if method == 'sendmediagroup':
+            media = json.loads(params.get('media', '[]'))
+            return self._ok([self._message(chat_id) for _ in media])
+        if method.startswith('send'):
+            return self._ok(self._message(chat_id))
+        return self._ok(True)
+
+    def _chat_member(self, user: dict) -> dict:
+        if self.member_status == 'administrator':
+            rights = ('can_manage_chat', 'can_delete_messages', 'can_manage_video_chats', 'can_restrict_members',
+                      'can_promote_members', 'can_change_info', 'can_invite_users')
+            return {'status': 'administrator', 'user': user, 'can_be_edited': False, 'is_anonymous': False,
+                    **{right: True for right in rights}}
+        return {'status': self.member_status, 'user': user}
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serverni ishga tushirish; bazaviy URL ni qaytaradi (port=0 - bo'sh port tanlanadi)"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency', type=float, default=0.0, help="javob kechikishi, soniya")
+    parser.add_argument('--jitter', type=float, default=0.0, help="kechikishga qo'shiladigan tasodifiy qism")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="429 qaytarish ehtimoli (0..1)")
+    parser.add_argument('--retry-after', type=int, default=1, help="429 dagi retry_after")
+    parser.add_argument('--member-status', default='member', choices=['member', 'left', 'administrator'])
+
+
+def from_arguments(args: argparse.Namespace) -> FakeTelegramAPI:
+    return FakeTelegramAPI(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        retry_after=args.retry_after, member_status=args.member_status
+    )
+
+
+async def serve(args: argparse.Namespace):
+    api = from_arguments(args)
+    url = await api.start(args.host, args.port)
+    print(f"Soxta Bot API: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
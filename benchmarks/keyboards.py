@@ -0,0 +1,111 @@
+"""Klaviaturalarni har safar yaratish va tayyor obyektlarni ishlatishni solishtirish
+
+Ishga tushirish (loyiha papkasidan):
+    python benchmarks/keyboards.py [takrorlar_soni]
+
+Har bir "xabar" uchun menyu tugmasi tekshiriladi va javob klaviaturasi
+olinadi - handle_movie_number va start_handler dagi yo'l.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+from keyboards import ADMIN_KEYBOARD, MAIN_MENU_KEYBOARD, MENU_BUTTONS, SubscriptionKeyboards
+
+CHANNELS = [
+    {'username': '@football_zoneX', 'url': 'https://t.me/football_zoneX'},
+    {'username': '@kino_uz', 'url': 'https://t.me/kino_uz'},
+]
+TEXTS = ["123", "Titanic", "📊 Statistika", "📝 Kino kodini kiritish", "S4"]
+
+
+# Oldingi usul: har bir chaqiruvda yangi obyektlar
+def build_main_menu_keyboard():
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="📝 Kino kodini kiritish")]
+        ],
+        resize_keyboard=True
+    )
+
+def build_admin_keyboard():
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="🎬 Kino qo'shish"), KeyboardButton(text="🗑 Kino o'chirish")],
+            [KeyboardButton(text="📊 Statistika"), KeyboardButton(text="📢 Kanallar boshqaruvi")],
+            [KeyboardButton(text="📨 Barchaga xabar yuborish"), KeyboardButton(text="📋 Kino ro'yxati")],
+            [KeyboardButton(text="📺 Serial qo'shish"), KeyboardButton(text="➕ Qism qo'shish")],
+            [KeyboardButton(text="🔙 Asosiy menyu")]
+        ],
+        resize_keyboard=True
+    )
+
+def build_subscription_keyboard(not_subscribed):
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for channel in not_subscribed:
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(text=f"📢 {channel['username']}", url=channel['url'])
+        ])
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription")
+    ])
+    return keyboard
+
+def old_message(text):
+    admin_buttons = [
+        "🎬 Kino qo'shish", "🗑 Kino o'chirish", "📊 Statistika", "📢 Kanallar boshqaruvi",
+        "📨 Barchaga xabar yuborish", "📋 Kino ro'yxati", "🔙 Asosiy menyu",
+        "➕ Kanal qo'shish", "🗑 Kanal o'chirish", "📋 Kanallar ro'yxati", "🔙 Orqaga",
+        "❌ Bekor qilish", "📝 Kino kodini kiritish", "📺 Serial qo'shish", "➕ Qism qo'shish"
+    ]
+    if text in admin_buttons:
+        return build_admin_keyboard()
+    return build_main_menu_keyboard(), build_subscription_keyboard(CHANNELS)
+
+
+# Yangi usul: tayyor obyektlar va frozenset
+subscription_keyboards = SubscriptionKeyboards()
+
+def new_message(text):
+    if text in MENU_BUTTONS:
+        return ADMIN_KEYBOARD
+    return MAIN_MENU_KEYBOARD, subscription_keyboards.get(CHANNELS)
+
+
+def measure(func, iterations):
+    for text in TEXTS:
+        func(text)
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(TEXTS[i % len(TEXTS)])
+    elapsed = time.perf_counter() - start
+
+    # Har bir xabar davomida ajratilgan eng ko'p xotira (vaqtinchalik obyektlar ham hisobga olinadi)
+    tracemalloc.start()
+    peak_total = 0
+    for i in range(iterations):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func(TEXTS[i % len(TEXTS)])
+        peak_total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return elapsed / iterations * 1e6, peak_total / iterations
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{iterations} ta xabar")
+    print(f"{'':>10} {'mks/xabar':>10} {'bayt/xabar':>11}")
+    for name, func in [("oldingi", old_message), ("tayyor", new_message)]:
+        usec, size = measure(func, iterations)
+        print(f"{name:>10} {usec:>10.2f} {size:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
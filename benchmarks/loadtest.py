@@ -0,0 +1,116 @@
+"""Yuklama testi: main.py ni soxta Bot API serverga ulab, sintetik foydalanuvchilar oqimini yuborish
+
+Ishga tushirish (loyiha papkasidan):
+    python benchmarks/loadtest.py --users 200 --codes 5 --latency 0.03 --error-rate 0.01
+
+Har bir virtual foydalanuvchi /start yuboradi, so'ng ketma-ket kino kodlarini
+yuboradi; har bir xabar uchun botning shu chatga birinchi javobigacha bo'lgan
+vaqt o'lchanadi. Bot polling rejimida, vaqtinchalik baza bilan ishlaydi.
+--max-p99 berilsa va p99 undan oshsa (yoki javobsiz qolgan xabar bo'lsa) chiqish kodi 1 bo'ladi.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_api import FakeTelegramAPI, add_arguments, from_arguments
+
+
+class VirtualUsers:
+    """Har bir chat uchun javob kutayotgan xabar va o'lchangan kechikishlar"""
+
+    def __init__(self):
+        self.latencies = []
+        self.timeouts = 0
+        self._waiting = {}
+
+    def on_send(self, chat_id: int, method: str):
+        future = self._waiting.pop(chat_id, None)
+        if future is not None and not future.done():
+            future.set_result(time.perf_counter())
+
+    async def send(self, api: FakeTelegramAPI, user_id: int, text: str, timeout: float):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[user_id] = future
+        start = time.perf_counter()
+        api.push_message(user_id, text)
+        try:
+            self.latencies.append(await asyncio.wait_for(future, timeout) - start)
+        except asyncio.TimeoutError:
+            self._waiting.pop(user_id, None)
+            self.timeouts += 1
+
+
+def percentile(values, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def user_session(api, users: VirtualUsers, user_id: int, args, movie_ids):
+    await users.send(api, user_id, '/start', args.timeout)
+    for _ in range(args.codes):
+        if args.think:
+            await asyncio.sleep(random.uniform(0, 2 * args.think))
+        await users.send(api, user_id, str(random.choice(movie_ids)), args.timeout)
+
+
+async def run(args) -> int:
+    api = from_arguments(args)
+    users = VirtualUsers()
+    api.on_send = users.on_send
+    url = await api.start()
+
+    os.environ['BOT_API_URL'] = url
+    os.environ['BOT_TOKEN'] = '123456:LOADTEST'
+    os.environ['BOT_MODE'] = 'polling'
+    os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(), 'loadtest.db'))
+    import main
+
+    await main.on_startup()
+    movie_ids = [await main.db.add_movie(f"Kino {i}", "Tavsif", f"FILE_{i}") for i in range(args.movies)]
+    await main.warm_up_movie_cache()
+    api.calls.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        user_session(api, users, 10_000 + i, args, movie_ids) for i in range(args.users)
+    ])
+    elapsed = time.perf_counter() - start
+    await main.on_shutdown()
+    await api.stop()
+
+    updates = args.users * (args.codes + 1)
+    api_calls = sum(count for method, count in api.calls.items() if method != 'getupdates')
+    p50, p99 = percentile(users.latencies, 0.5), percentile(users.latencies, 0.99)
+    print(f"Updatelar: {updates} ({args.users} foydalanuvchi x {args.codes + 1}), vaqt: {elapsed:.2f} s")
+    print(f"O'tkazuvchanlik: {updates / elapsed:.1f} update/s")
+    print(f"Kechikish: p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, "
+          f"max {max(users.latencies, default=0) * 1000:.1f} ms")
+    print(f"API so'rovlar: {api_calls} ({api_calls / updates:.2f} / update), 429 qaytarilgan: {api.errors}, "
+          f"javobsiz: {users.timeouts}")
+    for method, count in api.calls.most_common():
+        print(f"  {method}: {count}")
+
+    if users.timeouts or (args.max_p99 is not None and p99 > args.max_p99):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100, help="virtual foydalanuvchilar soni")
+    parser.add_argument('--codes', type=int, default=5, help="har bir foydalanuvchi yuboradigan kino kodlari")
+    parser.add_argument('--movies', type=int, default=50, help="bazaga qo'shiladigan kinolar soni")
+    parser.add_argument('--think', type=float, default=1.0,
+                        help="xabarlar orasidagi o'rtacha pauza, soniya (chat limiti 1/s)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="bitta javobni kutish chegarasi")
+    parser.add_argument('--max-p99', type=float, default=None, help="CI uchun: p99 chegarasi, soniya")
+    add_arguments(parser)
+    sys.exit(asyncio.run(run(parser.parse_args())))
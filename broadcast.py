@@ -0,0 +1,171 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from database import Database
+
+
+class BroadcastJob:
+    def __init__(self, job_id, from_chat_id, message_id, admin_chat_id, progress_message_id,
+                 last_user_id=0, total=0, sent=0, failed=0, blocked=0, active_since=None):
+        self.id = job_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.admin_chat_id = admin_chat_id
+        self.progress_message_id = progress_message_id
+        self.last_user_id = last_user_id
+        self.total = total
+        self.sent = sent
+        self.failed = failed
+        self.blocked = blocked
+        self.active_since = active_since
+        self.blocked_users = []
+
+
+class BroadcastEngine:
+    """Fon rejimidagi ommaviy xabar yuborish
+
+    Xabar copy_message orqali yuboriladi (matn ham, media ham), bir nechta worker
+    parallel ishlaydi. Tezlik limiti, flood limitda kutish va qayta urinish bot
+    sessiyasidagi RateLimitMiddleware da - bu yerda ular takrorlanmaydi.
+    Har bir bo'lak (chunk) tugagach kursor bazaga yoziladi, shuning uchun bot
+    qayta ishga tushsa ish to'xtagan joyidan davom etadi.
+    """
+
+    def __init__(self, bot: Bot, db: Database, workers: int = 10,
+                 chunk_size: int = 200, progress_interval: float = 5):
+        self.bot = bot
+        self.db = db
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self._tasks = {}
+        self._stopping = False
+
+    async def start(self, from_chat_id: int, message_id: int, admin_chat_id: int, active_since: str = None) -> int:
+        """active_since berilsa faqat shu vaqtdan beri faol bo'lgan foydalanuvchilarga yuboriladi"""
+        total = await self.db.count_users(active_since)
+        progress = await self.bot.send_message(admin_chat_id, f"📨 Xabar {total} ta foydalanuvchiga yuborilmoqda...")
+        job_id = await self.db.create_broadcast(
+            from_chat_id, message_id, admin_chat_id, progress.message_id, total, active_since
+        )
+        self._spawn(BroadcastJob(
+            job_id, from_chat_id, message_id, admin_chat_id, progress.message_id,
+            total=total, active_since=active_since
+        ))
+        return job_id
+
+    async def resume(self):
+        """Bot to'xtaganda tugallanmay qolgan yuborishlarni davom ettirish"""
+        for row in await self.db.get_running_broadcasts():
+            job = BroadcastJob(*row)
+            if job.id not in self._tasks:
+                logging.info(f"Ommaviy xabar #{job.id} davom ettirilmoqda (user_id > {job.last_user_id})")
+                self._spawn(job)
+
+    async def stop(self, timeout: float = None):
+        """Yuborishlarni to'xtatish
+
+        Navbatga yangi foydalanuvchi qo'shilmaydi; navbatdagilar yuborilib, joyi bazaga
+        saqlanadi va keyingi ishga tushishda resume shu joydan davom ettiradi.
+        `timeout` ichida ulgurmaganlari bekor qilinadi (oxirgi saqlangan joydan davom etadi).
+        """
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def _spawn(self, job: BroadcastJob):
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _run(self, job: BroadcastJob):
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self._worker(job, queue)) for _ in range(self.workers)]
+        reporter = asyncio.create_task(self._report_loop(job))
+        try:
+            users = self.db.iter_users(self.chunk_size, after_user_id=job.last_user_id, active_since=job.active_since)
+            async for chunk in users:
+                for user_id, in chunk:
+                    if self._stopping:
+                        break
+                    await queue.put(user_id)
+                    job.last_user_id = user_id
+                await queue.join()
+                await self._save(job)
+                if self._stopping:
+                    return
+
+            await self._save(job, status='done')
+            await self._edit_progress(job, finished=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Ommaviy xabar #{job.id} xatosi: {e}")
+        finally:
+            reporter.cancel()
+            for worker in workers:
+                worker.cancel()
+
+    async def _save(self, job: BroadcastJob, status: str = 'running'):
+        blocked_users, job.blocked_users = job.blocked_users, []
+        await self.db.save_broadcast_progress(
+            job.id, job.last_user_id, job.sent, job.failed, job.blocked, blocked_users, status
+        )
+
+    async def _worker(self, job: BroadcastJob, queue: asyncio.Queue):
+        while True:
+            user_id = await queue.get()
+            try:
+                await self._send(job, user_id)
+            finally:
+                queue.task_done()
+
+    async def _send(self, job: BroadcastJob, user_id: int):
+        try:
+            await self.bot.copy_message(user_id, job.from_chat_id, job.message_id)
+            job.sent += 1
+        except TelegramForbiddenError:
+            # Foydalanuvchi botni bloklagan
+            job.blocked += 1
+            job.blocked_users.append(user_id)
+        except TelegramBadRequest as e:
+            logging.warning(f"Xabar yuborilmadi {user_id}: {e}")
+            job.failed += 1
+        except Exception as e:
+            # Middleware urinishlari tugagan (flood limit, tarmoq xatosi)
+            logging.warning(f"Xabar yuborishda xatolik {user_id}: {e}")
+            job.failed += 1
+
+    async def _report_loop(self, job: BroadcastJob):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await self._edit_progress(job)
+
+    async def _edit_progress(self, job: BroadcastJob, finished: bool = False):
+        if finished:
+            text = "✅ Xabar yuborish yakunlandi!\n\n"
+        else:
+            text = f"📨 Xabar {job.total} ta foydalanuvchiga yuborilmoqda...\n\n"
+        text += (
+            f"✅ Muvaffaqiyatli: {job.sent}\n"
+            f"🚫 Bloklagan: {job.blocked}\n"
+            f"❌ Xatolik: {job.failed}"
+        )
+        try:
+            await self.bot.edit_message_text(text, chat_id=job.admin_chat_id, message_id=job.progress_message_id)
+        except TelegramBadRequest:
+            # "message is not modified" va shunga o'xshashlar
+            pass
+        except Exception as e:
+            logging.warning(f"Ommaviy xabar holatini yangilashda xatolik: {e}")
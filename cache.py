@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+
+
+class SubscriptionCache:
+    """(foydalanuvchi, kanal) a'zoligi uchun TTL kesh"""
+
+    def __init__(self, positive_ttl: float = 600, negative_ttl: float = 30, max_size: int = 100_000):
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = {}
+
+    def get(self, user_id: int, channel):
+        """Keshdagi natija: True/False, yoki yo'q/eskirgan bo'lsa None"""
+        key = (user_id, channel)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        is_member, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return is_member
+
+    def set(self, user_id: int, channel, is_member: bool):
+        if len(self._data) >= self.max_size:
+            self._evict()
+        ttl = self.positive_ttl if is_member else self.negative_ttl
+        self._data[(user_id, channel)] = (is_member, time.monotonic() + ttl)
+
+    def invalidate_channel(self, channel):
+        for key in [key for key in self._data if key[1] == channel]:
+            del self._data[key]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self._data.items() if expires_at < now]:
+            del self._data[key]
+
+        # Hammasi hali yangi bo'lsa, eng eski yarmini o'chiramiz
+        if len(self._data) >= self.max_size:
+            for key in list(self._data)[:len(self._data) // 2]:
+                del self._data[key]
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class MovieCache:
+    """Kino kodi bo'yicha chegaralangan LRU kesh"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def get(self, movie_id: int):
+        movie = self._data.get(movie_id)
+        if movie is None:
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(movie_id)
+        self.hits += 1
+        return movie
+
+    def set(self, movie_id: int, movie):
+        self._data[movie_id] = movie
+        self._data.move_to_end(movie_id)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, movie_id: int):
+        self._data.pop(movie_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class TTLCache:
+    """Kichik qiymatlar (masalan, jami sonlar) uchun muddatli kesh"""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._data = {}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def set(self, key, value):
+        self._data[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
@@ -0,0 +1,79 @@
+import asyncio
+import csv
+import json
+import os
+from itertools import islice
+
+# Import/eksport ustunlari; id ixtiyoriy (berilsa kino kodi saqlanadi)
+MOVIE_FIELDS = ('id', 'title', 'description', 'file_id')
+FORMATS = ('csv', 'jsonl')
+
+
+def detect_format(filename: str):
+    """Fayl kengaytmasi bo'yicha: "csv", "jsonl" yoki None"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    return None
+
+
+def _read_jsonl(file):
+    for line in file:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def _movie_row(record):
+    """Yozuvdan (id yoki None, title, description, file_id); yaroqsiz bo'lsa None"""
+    if not isinstance(record, dict):
+        return None
+    title = str(record.get('title') or '').strip()
+    file_id = str(record.get('file_id') or '').strip()
+    if not title or not file_id:
+        return None
+    movie_id = str(record.get('id') or '').strip()
+    if movie_id and not movie_id.isdigit():
+        return None
+    return int(movie_id) if movie_id else None, title, str(record.get('description') or '').strip(), file_id
+
+
+async def read_movies(path: str, fmt: str, chunk_size: int = 500):
+    """Fayldan kinolarni bo'lak-bo'lak o'qiydigan async generator: (qatorlar, yaroqsizlar soni)
+
+    Fayl oqim sifatida o'qiladi - xotirada bir vaqtda faqat bitta bo'lak turadi;
+    o'qish va tahlil alohida oqimda bajariladi, event loop to'xtab qolmaydi.
+    """
+    with open(path, encoding='utf-8-sig', newline='') as file:
+        records = csv.DictReader(file) if fmt == 'csv' else _read_jsonl(file)
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(islice(records, chunk_size)))
+            if not chunk:
+                return
+            rows = [row for row in map(_movie_row, chunk) if row is not None]
+            yield rows, len(chunk) - len(rows)
+
+
+class MovieWriter:
+    """Kinolarni CSV yoki JSONL faylga yozish (eksport)"""
+
+    def __init__(self, file, fmt: str):
+        self.file = file
+        self.fmt = fmt
+        if fmt == 'csv':
+            self._csv = csv.writer(file)
+            self._csv.writerow(MOVIE_FIELDS)
+
+    def write(self, rows):
+        if self.fmt == 'csv':
+            self._csv.writerows(rows)
+            return
+        self.file.writelines(
+            json.dumps(dict(zip(MOVIE_FIELDS, row)), ensure_ascii=False) + '\n' for row in rows
+        )
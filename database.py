@@ -0,0 +1,1056 @@
+import asyncio
+import html
+import logging
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+# Ulanish sozlamalari: WAL o'qish va yozishni bir-biriga to'sqinlik qilmaydigan qiladi
+# busy_timeout birinchi: bir vaqtda ishga tushgan jarayonlarda WAL ga o'tish ham qulfni kutadi
+PRAGMAS = (
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 67108864',
+    'PRAGMA foreign_keys = ON',
+)
+
+# Kino caption i: "🎬 Nomi\n\nTavsif\n\n🔢 Kino raqami: 12" (triggerlarda NEW qatori uchun)
+MOVIE_CAPTION_SQL = (
+    "'🎬 ' || NEW.title || char(10, 10) || COALESCE(NEW.description, '') || char(10, 10) "
+    "|| '🔢 Kino raqami: ' || NEW.id"
+)
+
+
+def _html_unescape(text):
+    """SQL funksiyasi html_unescape: bazadagi nom va tavsif HTML-escape qilingan holda saqlanadi"""
+    return html.unescape(text) if text else text
+
+
+# Xato yozilgan so'rov: trigrammalarning qancha qismi nomda bo'lsa mos deb olinadi va
+# shu tekshiruv uchun FTS dan nechta nomzod o'qiladi
+TRIGRAM_MIN_SHARE = 0.5
+TRIGRAM_CANDIDATES = 200
+
+
+class Database:
+    """Bitta doimiy SQLite ulanishi; barcha so'rovlar alohida oqimda bajariladi
+
+    sqlite3 tayyorlangan so'rovlarni (prepared statements) ulanish darajasida
+    keshlaydi, shuning uchun SQL matnlari o'zgarmas satrlar sifatida saqlanadi.
+    """
+
+    def __init__(self, path: str = 'movies.db'):
+        self.path = path
+        self._conn = None
+        self._executor = None
+
+    # Past darajali API
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        # Qidiruv indeksi triggerlarida ishlatiladi - movies ga yozadigan har bir ulanishda kerak
+        conn.create_function('html_unescape', 1, _html_unescape, deterministic=True)
+        self._conn = conn
+        self._migrate()
+
+    async def connect(self):
+        if self._conn is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+            await self._run(self._connect)
+            logging.info("Ma'lumotlar bazasiga ulanildi")
+
+    def _close(self):
+        if self._conn is not None:
+            # WAL dagi yozuvlarni asosiy faylga o'tkazish: keyingi ishga tushish -wal faylini qayta o'qimaydi
+            self._conn.execute('PRAGMA optimize')
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        if self._executor is None:
+            return
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    def _execute(self, sql: str, params=()):
+        cursor = self._conn.execute(sql, params)
+        return cursor.lastrowid, cursor.rowcount
+
+    # Yozuvchi tranzaksiyalar BEGIN IMMEDIATE bilan: oddiy BEGIN o'qishdan boshlanib keyin
+    # yozishga o'tolmay qolsa (boshqa jarayon yozayotgan bo'lsa) busy_timeout kutmasdan
+    # "database is locked" beradi
+    def _transaction(self, func, *args):
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(self._conn, *args)
+            self._conn.execute('COMMIT')
+            return result
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def _fetchone(self, sql: str, params=()):
+        return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params=()):
+        return self._conn.execute(sql, params).fetchall()
+
+    async def execute(self, sql: str, params=()):
+        """(lastrowid, rowcount) qaytaradi"""
+        return await self._run(self._execute, sql, params)
+
+    async def transaction(self, func, *args):
+        """func(conn, *args) ni bitta tranzaksiya ichida bajarish"""
+        return await self._run(self._transaction, func, *args)
+
+    async def fetchone(self, sql: str, params=()):
+        return await self._run(self._fetchone, sql, params)
+
+    async def fetchall(self, sql: str, params=()):
+        return await self._run(self._fetchall, sql, params)
+
+    # Sxema: migratsiyalar PRAGMA user_version bo'yicha bir martadan bajariladi
+    def _migrate(self):
+        """Har bir qadam alohida BEGIN IMMEDIATE tranzaksiyada
+
+        Bir vaqtda ishga tushgan jarayonlar navbat bilan yozadi; user_version qulf
+        olingandan keyin qayta o'qiladi, shuning uchun qadam ikki marta bajarilmaydi.
+        """
+        if self._user_version() >= len(self.MIGRATIONS):
+            return
+
+        migrated = False
+        while True:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                version = self._user_version()
+                if version >= len(self.MIGRATIONS):
+                    self._conn.execute('COMMIT')
+                    break
+                migration = self.MIGRATIONS[version]
+                migration(self)
+                self._conn.execute(f'PRAGMA user_version = {version + 1}')
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            migrated = True
+            logging.info(f"Baza migratsiyasi bajarildi: {version + 1} ({migration.__name__})")
+
+        if migrated:
+            # Indekslar o'zgargandan keyin rejalashtiruvchi uchun statistika
+            self._conn.execute('ANALYZE')
+
+    def _user_version(self) -> int:
+        return self._conn.execute('PRAGMA user_version').fetchone()[0]
+
+    def _create_tables(self):
+        """1: boshlang'ich sxema
+
+        user_version qo'shilishidan oldingi bazalar ham shu yerdan o'tadi, shuning uchun
+        hammasi IF NOT EXISTS va _add_column orqali.
+        """
+        cursor = self._conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS movies (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                file_id TEXT NOT NULL,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER UNIQUE,
+                username TEXT,
+                full_name TEXT,
+                joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS channels (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE,
+                url TEXT,
+                chat_id INTEGER,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS admins (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER UNIQUE,
+                username TEXT,
+                full_name TEXT,
+                added_by INTEGER,
+                added_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS series (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                description TEXT,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS episodes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                series_id INTEGER,
+                episode_number INTEGER,
+                file_id TEXT NOT NULL,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (series_id) REFERENCES series (id) ON DELETE CASCADE
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_episodes_series_id ON episodes(series_id)')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS broadcasts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                from_chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                admin_chat_id INTEGER NOT NULL,
+                progress_message_id INTEGER,
+                active_since TIMESTAMP,
+                status TEXT DEFAULT 'running',
+                last_user_id INTEGER DEFAULT 0,
+                total_count INTEGER DEFAULT 0,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0,
+                blocked_count INTEGER DEFAULT 0,
+                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_date TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fsm_storage (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                expires_at REAL NOT NULL
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS processed_updates (
+                update_id INTEGER PRIMARY KEY,
+                created_at REAL NOT NULL
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                date DATE UNIQUE,
+                joined_count INTEGER DEFAULT 0,
+                left_count INTEGER DEFAULT 0
+            )
+        ''')
+
+        # Eski bazalarda yangi ustunlar bo'lmasligi mumkin
+        self._add_column('channels', 'chat_id', 'INTEGER')
+        self._add_column('users', 'is_active', 'INTEGER DEFAULT 1')
+        self._add_column('broadcasts', 'active_since', 'TIMESTAMP')
+        # Kino: tayyor caption, saqlash kanalidagi xabar ID si va file_id tekshiruvi natijasi
+        self._add_column('movies', 'caption', 'TEXT')
+        self._add_column('movies', 'storage_message_id', 'INTEGER')
+        self._add_column('movies', 'checked_at', 'TIMESTAMP')
+        self._add_column('movies', 'broken_at', 'TIMESTAMP')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_movies_checked_at ON movies(checked_at)')
+
+        self._create_stats_triggers()
+        self._create_search_index()
+        self._create_caption_triggers()
+
+        # Dastlabki kanalni qo'shish
+        cursor.execute('''
+            INSERT OR IGNORE INTO channels (username, url)
+            VALUES (?, ?)
+        ''', ('football_zoneX', 'https://t.me/football_zoneX'))
+
+    def _create_stats_triggers(self):
+        """user_stats kunlik hisoblagichlarini users jadvali o'zgarishlaridan yuritish"""
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'users_joined_stats'"
+        ).fetchone()
+        if exists:
+            return
+
+        # Triggerlar birinchi marta yaratilayotganda mavjud foydalanuvchilar bo'yicha to'ldiramiz
+        self._conn.execute('''
+            INSERT INTO user_stats (date, joined_count)
+            SELECT date(joined_date), COUNT(*) FROM users WHERE joined_date IS NOT NULL GROUP BY 1
+            ON CONFLICT(date) DO UPDATE SET joined_count = MAX(joined_count, excluded.joined_count)
+        ''')
+
+        self._conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_joined_stats AFTER INSERT ON users
+            BEGIN
+                INSERT INTO user_stats (date, joined_count) VALUES (date('now'), 1)
+                ON CONFLICT(date) DO UPDATE SET joined_count = joined_count + 1;
+            END
+        ''')
+
+        # Botni bloklagan foydalanuvchi ketgan, qayta faollashgani qaytgan hisoblanadi
+        self._conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_left_stats AFTER UPDATE OF is_active ON users
+            WHEN OLD.is_active = 1 AND NEW.is_active = 0
+            BEGIN
+                INSERT INTO user_stats (date, left_count) VALUES (date('now'), 1)
+                ON CONFLICT(date) DO UPDATE SET left_count = left_count + 1;
+            END
+        ''')
+
+        self._conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS users_returned_stats AFTER UPDATE OF is_active ON users
+            WHEN OLD.is_active = 0 AND NEW.is_active = 1
+            BEGIN
+                INSERT INTO user_stats (date, joined_count) VALUES (date('now'), 1)
+                ON CONFLICT(date) DO UPDATE SET joined_count = joined_count + 1;
+            END
+        ''')
+
+    def _create_search_index(self):
+        """movies ustidan FTS5 indekslari va ularni sinxron ushlab turuvchi triggerlar
+
+        movies_fts - so'zlar va prefikslar bo'yicha qidiruv,
+        movies_trigram - xato yozilgan so'zlar uchun trigramma bo'yicha qidiruv.
+        """
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'"
+        ).fetchone()
+        if exists:
+            return
+
+        self._conn.execute('''
+            CREATE VIRTUAL TABLE movies_fts USING fts5(
+                title, description,
+                content = 'movies', content_rowid = 'id',
+                tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+            )
+        ''')
+        self._conn.execute('''
+            CREATE VIRTUAL TABLE movies_trigram USING fts5(
+                title,
+                content = 'movies', content_rowid = 'id',
+                tokenize = 'trigram'
+            )
+        ''')
+
+        self._conn.execute('''
+            CREATE TRIGGER movies_search_ai AFTER INSERT ON movies
+            BEGIN
+                INSERT INTO movies_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+                INSERT INTO movies_trigram (rowid, title) VALUES (NEW.id, NEW.title);
+            END
+        ''')
+        self._conn.execute('''
+            CREATE TRIGGER movies_search_ad AFTER DELETE ON movies
+            BEGIN
+                INSERT INTO movies_fts (movies_fts, rowid, title, description)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description);
+                INSERT INTO movies_trigram (movies_trigram, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+            END
+        ''')
+        self._conn.execute('''
+            CREATE TRIGGER movies_search_au AFTER UPDATE OF title, description ON movies
+            BEGIN
+                INSERT INTO movies_fts (movies_fts, rowid, title, description)
+                VALUES ('delete', OLD.id, OLD.title, OLD.description);
+                INSERT INTO movies_trigram (movies_trigram, rowid, title) VALUES ('delete', OLD.id, OLD.title);
+                INSERT INTO movies_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+                INSERT INTO movies_trigram (rowid, title) VALUES (NEW.id, NEW.title);
+            END
+        ''')
+
+        # Mavjud kinolarni indekslash
+        self._conn.execute("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')")
+        self._conn.execute("INSERT INTO movies_trigram (movies_trigram) VALUES ('rebuild')")
+
+    def _create_caption_triggers(self):
+        """movies.caption ni qo'shish/tahrirlashda bir marta hisoblash
+
+        Har bir so'rovda caption qayta yig'ilmaydi - qator bilan birga tayyor holda o'qiladi.
+        """
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'movies_caption_ai'"
+        ).fetchone()
+        if exists:
+            return
+
+        self._conn.execute(f'''
+            CREATE TRIGGER movies_caption_ai AFTER INSERT ON movies
+            BEGIN
+                UPDATE movies SET caption = {MOVIE_CAPTION_SQL} WHERE id = NEW.id;
+            END
+        ''')
+        self._conn.execute(f'''
+            CREATE TRIGGER movies_caption_au AFTER UPDATE OF title, description ON movies
+            BEGIN
+                UPDATE movies SET caption = {MOVIE_CAPTION_SQL} WHERE id = NEW.id;
+            END
+        ''')
+
+        # Mavjud kinolar uchun
+        self._conn.execute(f"UPDATE movies SET caption = {MOVIE_CAPTION_SQL.replace('NEW.', '')}")
+
+    def _add_column(self, table: str, column: str, definition: str):
+        columns = [row[1] for row in self._conn.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    def _update_indexes(self):
+        """2: indekslarni haqiqiy so'rovlarga moslash
+
+        idx_movies_id va idx_series_id - PRIMARY KEY ning nusxasi, idx_users_user_id - UNIQUE(user_id)
+        avtoindeksining nusxasi (upsert ON CONFLICT(user_id) shu avtoindeksdan foydalanadi).
+        idx_users_joined_date: kunlik statistika user_stats dan o'qiladi, indeks faqat har bir
+        INSERT ni qimmatlashtirardi. idx_users_last_active o'rniga faqat faol foydalanuvchilar
+        bo'yicha qisman indeks: bloklaganlar indeksda joy egallamaydi (covering emas - 4 ga qarang).
+        """
+        for index in ('idx_movies_id', 'idx_series_id', 'idx_users_user_id',
+                      'idx_users_joined_date', 'idx_users_last_active'):
+            self._conn.execute(f'DROP INDEX IF EXISTS {index}')
+        self._conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_users_active_last_active ON users(last_active) WHERE is_active = 1'
+        )
+
+    def _create_cache_versions(self):
+        """3: jarayonlar orasida kesh versiyalari
+
+        Adminlar yoki kinolar o'zgarganda triggerlar versiyani oshiradi (qaysi jarayon
+        yozganidan qat'i nazar). Jarayonlar shu kichik jadvalni bir necha soniyada bir
+        o'qib, versiya o'zgargan keshni yangilaydi. Yangi kino qo'shilishi keshga ta'sir
+        qilmaydi (kesh faqat topilgan kinolarni saqlaydi), storage_message_id esa
+        eskirgan bo'lsa ham kino file_id orqali yuboriladi.
+        """
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)'
+        )
+        self._conn.execute("INSERT OR IGNORE INTO cache_versions (name) VALUES ('admins'), ('movies')")
+        triggers = {
+            'admins_version_ai': ('AFTER INSERT ON admins', 'admins'),
+            'admins_version_ad': ('AFTER DELETE ON admins', 'admins'),
+            'movies_version_ad': ('AFTER DELETE ON movies', 'movies'),
+            'movies_version_au': ('AFTER UPDATE OF title, description, file_id ON movies', 'movies'),
+        }
+        for name, (event, cache) in triggers.items():
+            self._conn.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {name} {event}
+                BEGIN
+                    UPDATE cache_versions SET version = version + 1 WHERE name = '{cache}';
+                END
+            ''')
+
+    def _cover_active_users_index(self):
+        """4: idx_users_active_last_active ga is_active ustunini qo'shish
+
+        Qisman indeksning WHERE shartidagi ustun indeksda bo'lmasa, SQLite uni jadvaldan
+        o'qiydi. (last_active, is_active) bilan COUNT(*) ... WHERE is_active = 1 AND
+        last_active >= ? jadvalga tegmasdan - COVERING INDEX orqali hisoblanadi.
+        """
+        self._conn.execute('DROP INDEX IF EXISTS idx_users_active_last_active')
+        self._conn.execute(
+            'CREATE INDEX idx_users_active_last_active ON users(last_active, is_active) WHERE is_active = 1'
+        )
+
+    def _index_unescaped_text(self):
+        """5: qidiruv indekslarini HTML-escape qilinmagan matn ustidan qurish
+
+        Nom va tavsif bazada clean_input (html.escape) dan o'tgan holda saqlanadi; indeksda
+        "&amp;", "&#x27;" qoldirilsa "amp" yoki "x27" so'rovi & yoki ' bor hamma kinoga mos
+        kelardi. Triggerlar matnni html_unescape bilan indekslaydi. Indeks 'rebuild' bilan
+        emas (u movies dagi escape qilingan matnni o'qiydi), qaytadan to'ldiriladi.
+        """
+        for trigger in ('movies_search_ai', 'movies_search_ad', 'movies_search_au'):
+            self._conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+
+        fts_values = 'html_unescape({0}.title), html_unescape({0}.description)'
+        trigram_values = 'html_unescape({0}.title)'
+        insert = f'''
+            INSERT INTO movies_fts (rowid, title, description) VALUES (NEW.id, {fts_values.format('NEW')});
+            INSERT INTO movies_trigram (rowid, title) VALUES (NEW.id, {trigram_values.format('NEW')});
+        '''
+        delete = f'''
+            INSERT INTO movies_fts (movies_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, {fts_values.format('OLD')});
+            INSERT INTO movies_trigram (movies_trigram, rowid, title)
+            VALUES ('delete', OLD.id, {trigram_values.format('OLD')});
+        '''
+        self._conn.execute(f'CREATE TRIGGER movies_search_ai AFTER INSERT ON movies BEGIN {insert} END')
+        self._conn.execute(f'CREATE TRIGGER movies_search_ad AFTER DELETE ON movies BEGIN {delete} END')
+        self._conn.execute(
+            f'CREATE TRIGGER movies_search_au AFTER UPDATE OF title, description ON movies BEGIN {delete} {insert} END'
+        )
+
+        self._conn.execute("INSERT INTO movies_fts (movies_fts) VALUES ('delete-all')")
+        self._conn.execute("INSERT INTO movies_trigram (movies_trigram) VALUES ('delete-all')")
+        self._conn.execute(
+            f"INSERT INTO movies_fts (rowid, title, description) SELECT id, {fts_values.format('movies')} FROM movies"
+        )
+        self._conn.execute(
+            f"INSERT INTO movies_trigram (rowid, title) SELECT id, {trigram_values.format('movies')} FROM movies"
+        )
+
+    # Tartib muhim: yangi migratsiya faqat oxiriga qo'shiladi
+    MIGRATIONS = (
+        _create_tables, _update_indexes, _create_cache_versions, _cover_active_users_index, _index_unescaped_text
+    )
+
+    async def get_cache_versions(self) -> dict:
+        """{kesh nomi: versiya} - boshqa jarayon o'zgartirgan keshlarni aniqlash uchun"""
+        return dict(await self.fetchall('SELECT name, version FROM cache_versions'))
+
+    # Update lar takrorlanishini oldini olish
+    async def claim_update(self, update_id: int) -> bool:
+        """update_id birinchi marta ko'rilayotgan bo'lsa True"""
+        _, inserted = await self.execute(
+            'INSERT OR IGNORE INTO processed_updates (update_id, created_at) VALUES (?, ?)',
+            (update_id, time.time())
+        )
+        return inserted == 1
+
+    async def cleanup_processed_updates(self, max_age: float = 86400) -> int:
+        _, deleted = await self.execute(
+            'DELETE FROM processed_updates WHERE created_at < ?', (time.time() - max_age,)
+        )
+        return deleted
+
+    # Kanallar
+    async def get_channels(self):
+        try:
+            rows = await self.fetchall('SELECT username, url, chat_id FROM channels')
+            return [{"username": row[0], "url": row[1], "chat_id": row[2]} for row in rows]
+        except Exception as e:
+            logging.error(f"Kanallarni olishda xatolik: {e}")
+            return []
+
+    async def get_channels_page(self, after_id: int = 0, before_id: int = None, limit: int = 20):
+        """(id, username, url) qatorlari sahifasi"""
+        return await self._keyset_page('channels', 'id, username, url', after_id, before_id, limit)
+
+    async def set_channel_chat_id(self, username: str, chat_id: int):
+        try:
+            await self.execute('UPDATE channels SET chat_id = ? WHERE username = ?', (chat_id, username))
+        except Exception as e:
+            logging.error(f"Kanal ID sini saqlashda xatolik: {e}")
+
+    async def add_channel(self, username: str, url: str, chat_id: int):
+        await self.execute('''
+            INSERT OR REPLACE INTO channels (username, url, chat_id)
+            VALUES (?, ?, ?)
+        ''', (username, url, chat_id))
+
+    async def delete_channel(self, username: str):
+        """Kanalni o'chirish; topilsa (chat_id,) qatorini, aks holda None qaytaradi"""
+        channel = await self.fetchone('SELECT chat_id FROM channels WHERE username = ?', (username,))
+        if channel:
+            await self.execute('DELETE FROM channels WHERE username = ?', (username,))
+        return channel
+
+    # Foydalanuvchilar
+    @staticmethod
+    def _save_activity(conn, users, touches):
+        # ON CONFLICT ... DO UPDATE joined_date ni saqlab qoladi (INSERT OR REPLACE uni qayta yozardi)
+        conn.executemany('''
+            INSERT INTO users (user_id, username, full_name, last_active)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                full_name = excluded.full_name,
+                last_active = excluded.last_active,
+                is_active = 1
+        ''', users)
+        conn.executemany('UPDATE users SET last_active = ?, is_active = 1 WHERE user_id = ?', touches)
+
+    async def save_activity(self, users, touches):
+        """users: (user_id, username, full_name, last_active), touches: (last_active, user_id)"""
+        await self.transaction(self._save_activity, users, touches)
+
+    async def get_joined_dates(self, user_ids) -> dict:
+        """user_id -> joined_date (bazada bor foydalanuvchilar uchun)"""
+        user_ids = list(user_ids)
+        result = {}
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            rows = await self.fetchall(
+                f"SELECT user_id, joined_date FROM users WHERE user_id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            result.update(rows)
+        return result
+
+    async def iter_users(self, batch_size: int = 1000, after_user_id: int = 0, active_since: str = None,
+                         full: bool = False, only_active: bool = True):
+        """Foydalanuvchilarni keyset sahifalash bilan bo'lak-bo'lak qaytaruvchi async generator
+
+        Xotirada bir vaqtda faqat bitta bo'lak turadi. `active_since` berilsa faqat
+        shu vaqtdan keyin faol bo'lganlar olinadi (idx_users_active_last_active).
+        `full=True` bo'lsa qatorlar (user_id, username, full_name, joined_date, last_active)
+        ko'rinishida, aks holda (user_id,) ko'rinishida bo'ladi.
+        """
+        columns = 'user_id, username, full_name, joined_date, last_active' if full else 'user_id'
+        conditions = ['user_id > ?']
+        params = []
+        if only_active:
+            conditions.append('is_active = 1')
+        if active_since:
+            conditions.append('last_active >= ?')
+            params.append(active_since)
+        sql = f'SELECT {columns} FROM users WHERE {" AND ".join(conditions)} ORDER BY user_id LIMIT ?'
+
+        while True:
+            rows = await self.fetchall(sql, (after_user_id, *params, batch_size))
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_user_id = rows[-1][0]
+
+    async def count_users(self, active_since: str = None) -> int:
+        if active_since:
+            row = await self.fetchone(
+                'SELECT COUNT(*) FROM users WHERE is_active = 1 AND last_active >= ?', (active_since,)
+            )
+        else:
+            row = await self.fetchone('SELECT COUNT(*) FROM users WHERE is_active = 1')
+        return row[0]
+
+    async def set_user_active(self, user_id: int, is_active: bool):
+        """my_chat_member: foydalanuvchi botni bloklaganda yoki qayta ochganda"""
+        await self.execute('UPDATE users SET is_active = ? WHERE user_id = ?', (int(is_active), user_id))
+
+    async def get_user_stats(self, today: str, week_start: str, month_start: str):
+        """user_stats yig'indilari: ((bugun +, -), (hafta +, -), (oy +, -))
+
+        Faqat kunlik qatorlar o'qiladi, shuning uchun narx foydalanuvchilar soniga bog'liq emas.
+        """
+        since = min(week_start, month_start)
+        row = await self.fetchone('''
+            SELECT
+                COALESCE(SUM(CASE WHEN date >= ? THEN joined_count END), 0),
+                COALESCE(SUM(CASE WHEN date >= ? THEN left_count END), 0),
+                COALESCE(SUM(CASE WHEN date >= ? THEN joined_count END), 0),
+                COALESCE(SUM(CASE WHEN date >= ? THEN left_count END), 0),
+                COALESCE(SUM(CASE WHEN date >= ? THEN joined_count END), 0),
+                COALESCE(SUM(CASE WHEN date >= ? THEN left_count END), 0)
+            FROM user_stats WHERE date >= ?
+        ''', (today, today, week_start, week_start, month_start, month_start, since))
+        return (row[0], row[1]), (row[2], row[3]), (row[4], row[5])
+
+    async def get_total_users(self) -> int:
+        try:
+            row = await self.fetchone('SELECT COUNT(*) FROM users')
+            return row[0]
+        except Exception as e:
+            logging.error(f"Foydalanuvchilar sonini olishda xatolik: {e}")
+            return 0
+
+    # Adminlar
+    async def get_admin_ids(self) -> set:
+        rows = await self.fetchall('SELECT user_id FROM admins')
+        return {row[0] for row in rows}
+
+    async def get_admins(self):
+        """(user_id, username, full_name, added_date)"""
+        return await self.fetchall('SELECT user_id, username, full_name, added_date FROM admins ORDER BY id')
+
+    async def add_admin(self, user_id: int, added_by: int) -> bool:
+        """Admin qo'shish (ismi users jadvalidan olinadi); allaqachon admin bo'lsa False"""
+        _, inserted = await self.execute('''
+            INSERT INTO admins (user_id, username, full_name, added_by)
+            SELECT ?, u.username, u.full_name, ?
+            FROM (SELECT 1) LEFT JOIN users u ON u.user_id = ?
+            WHERE true
+            ON CONFLICT(user_id) DO NOTHING
+        ''', (user_id, added_by, user_id))
+        return inserted > 0
+
+    async def remove_admin(self, user_id: int) -> bool:
+        _, deleted = await self.execute('DELETE FROM admins WHERE user_id = ?', (user_id,))
+        return deleted > 0
+
+    # Kinolar
+    async def add_movie(self, title: str, description: str, file_id: str) -> int:
+        movie_id, _ = await self.execute('''
+            INSERT INTO movies (title, description, file_id)
+            VALUES (?, ?, ?)
+        ''', (title, description, file_id))
+        return movie_id
+
+    @staticmethod
+    def _add_movies(conn, rows):
+        # id berilganlar (katalogni tiklash) kodini saqlaydi; bunday id band bo'lsa qator o'tkazib yuboriladi
+        with_id = [row for row in rows if row[0] is not None]
+        without_id = [row[1:] for row in rows if row[0] is None]
+        added = 0
+        if with_id:
+            added += conn.executemany(
+                'INSERT OR IGNORE INTO movies (id, title, description, file_id) VALUES (?, ?, ?, ?)', with_id
+            ).rowcount
+        if without_id:
+            added += conn.executemany(
+                'INSERT INTO movies (title, description, file_id) VALUES (?, ?, ?)', without_id
+            ).rowcount
+        return added
+
+    async def add_movies(self, rows) -> int:
+        """(id yoki None, title, description, file_id) qatorlarini bitta tranzaksiyada qo'shish"""
+        return await self.transaction(self._add_movies, rows)
+
+    async def iter_movies(self, batch_size: int = 1000):
+        """(id, title, description, file_id) qatorlarini id bo'yicha bo'lak-bo'lak qaytaruvchi async generator"""
+        after_id = 0
+        while True:
+            rows = await self.fetchall(
+                'SELECT id, title, description, file_id FROM movies WHERE id > ? ORDER BY id LIMIT ?',
+                (after_id, batch_size)
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    async def set_storage_message_id(self, movie_id: int, message_id: int):
+        await self.execute('UPDATE movies SET storage_message_id = ? WHERE id = ?', (message_id, movie_id))
+
+    async def get_movie(self, movie_id: int):
+        """(id, title, description, file_id, caption, storage_message_id) yoki None"""
+        return await self._get_movie(movie_id)
+
+    async def _get_movie(self, movie_id: int):
+        return await self.fetchone('''
+            SELECT id, title, description, file_id, caption, storage_message_id FROM movies WHERE id = ?
+        ''', (movie_id,))
+
+    async def get_recent_movies(self, limit: int):
+        """Eng oxirgi qo'shilgan kinolar (keshni isitish uchun)"""
+        return await self.fetchall('''
+            SELECT id, title, description, file_id, caption, storage_message_id
+            FROM movies ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+
+    # file_id tekshiruvi
+    async def get_movies_to_check(self, limit: int):
+        """Eng uzoq tekshirilmagan kinolar: (id, title, file_id); hech tekshirilmaganlar birinchi"""
+        return await self.fetchall('SELECT id, title, file_id FROM movies ORDER BY checked_at LIMIT ?', (limit,))
+
+    @staticmethod
+    def _set_file_status(conn, results, checked_at):
+        broken = []
+        for movie_id, ok in results:
+            if ok:
+                conn.execute(
+                    'UPDATE movies SET checked_at = ?, broken_at = NULL WHERE id = ?', (checked_at, movie_id)
+                )
+                continue
+            # Avval ham buzilgan bo'lsa broken_at o'zgarmaydi va qayta xabar berilmaydi
+            cursor = conn.execute(
+                'UPDATE movies SET checked_at = ?, broken_at = ? WHERE id = ? AND broken_at IS NULL',
+                (checked_at, checked_at, movie_id)
+            )
+            if cursor.rowcount:
+                broken.append(movie_id)
+            else:
+                conn.execute('UPDATE movies SET checked_at = ? WHERE id = ?', (checked_at, movie_id))
+        return broken
+
+    async def set_file_status(self, results) -> list:
+        """[(movie_id, fayl ishlaydimi)] natijalarini yozish; yangi buzilgan kinolar ID larini qaytaradi"""
+        return await self.transaction(self._set_file_status, list(results), utc_timestamp())
+
+    async def get_broken_movies(self, limit: int = 50):
+        """(id, title, broken_at) - fayli ishlamay qolgan kinolar"""
+        return await self.fetchall(
+            'SELECT id, title, broken_at FROM movies WHERE broken_at IS NOT NULL ORDER BY id LIMIT ?', (limit,)
+        )
+
+    async def delete_movie(self, movie_id: int):
+        """Kinoni o'chirish; topilsa o'chirilgan qatorni, aks holda None qaytaradi"""
+        movie = await self._get_movie(movie_id)
+        if movie:
+            await self.execute('DELETE FROM movies WHERE id = ?', (movie_id,))
+        return movie
+
+    async def search_movies(self, query: str, limit: int = 10, offset: int = 0):
+        """Nom va tavsif bo'yicha qidiruv: get_movie bilan bir xil qatorlar
+
+        Avval har bir so'z prefiks sifatida qidiriladi (title ustuni og'irroq).
+        Hech narsa topilmasa, so'zlarning trigrammalari bo'yicha qidiriladi -
+        bitta-ikkita harfi xato yozilgan nomlar ham ko'p trigramma bilan mos tushadi.
+        """
+        words = [word.lower() for word in re.findall(r'\w+', query)]
+        if not words:
+            return []
+
+        prefix_query = ' '.join(f'"{word}"*' for word in words)
+        rows = await self.fetchall('''
+            SELECT m.id, m.title, m.description, m.file_id, m.caption, m.storage_message_id
+            FROM movies_fts JOIN movies m ON m.id = movies_fts.rowid
+            WHERE movies_fts MATCH ?
+            ORDER BY bm25(movies_fts, 10.0, 1.0)
+            LIMIT ? OFFSET ?
+        ''', (prefix_query, limit, offset))
+        if rows:
+            return rows
+        if offset and await self.fetchone('SELECT 1 FROM movies_fts WHERE movies_fts MATCH ? LIMIT 1', (prefix_query,)):
+            # Prefiks natijalari tugadi - boshqa rejimga o'tib ketmaymiz
+            return []
+
+        trigrams = {word[i:i + 3] for word in words if len(word) >= 3 for i in range(len(word) - 2)}
+        if not trigrams:
+            return []
+
+        # OR bitta umumiy trigramma bilan ham mos keladi ("termnator" -> "Harry Potter" "ter" orqali),
+        # shuning uchun nomzodlar orasidan trigrammalarining kamida TRIGRAM_MIN_SHARE qismi
+        # nomda uchraganlari qoldiriladi
+        candidates = await self.fetchall('''
+            SELECT m.id, m.title, m.description, m.file_id, m.caption, m.storage_message_id
+            FROM movies_trigram JOIN movies m ON m.id = movies_trigram.rowid
+            WHERE movies_trigram MATCH ?
+            ORDER BY rank
+            LIMIT ?
+        ''', (' OR '.join(f'"{trigram}"' for trigram in sorted(trigrams)), max(TRIGRAM_CANDIDATES, offset + limit)))
+        needed = len(trigrams) * TRIGRAM_MIN_SHARE
+        rows = [
+            row for row in candidates
+            if sum(trigram in html.unescape(row[1]).casefold() for trigram in trigrams) >= needed
+        ]
+        return rows[offset:offset + limit]
+
+    # Seriallar
+    async def add_series(self, title: str, description: str) -> int:
+        series_id, _ = await self.execute(
+            'INSERT INTO series (title, description) VALUES (?, ?)', (title, description)
+        )
+        return series_id
+
+    async def get_series(self, series_id: int):
+        """(id, title, description, qismlar soni) yoki None"""
+        return await self.fetchone('''
+            SELECT s.id, s.title, s.description,
+                   (SELECT COUNT(*) FROM episodes e WHERE e.series_id = s.id)
+            FROM series s WHERE s.id = ?
+        ''', (series_id,))
+
+    async def get_episode_numbers(self, series_id: int, limit: int, offset: int = 0):
+        rows = await self.fetchall(
+            'SELECT episode_number FROM episodes WHERE series_id = ? ORDER BY episode_number LIMIT ? OFFSET ?',
+            (series_id, limit, offset)
+        )
+        return [row[0] for row in rows]
+
+    async def get_episode(self, series_id: int, episode_number: int):
+        row = await self.fetchone(
+            'SELECT file_id FROM episodes WHERE series_id = ? AND episode_number = ?',
+            (series_id, episode_number)
+        )
+        return row[0] if row else None
+
+    async def get_episodes(self, series_id: int):
+        """Serialning barcha qismlari: (episode_number, file_id)"""
+        return await self.fetchall(
+            'SELECT episode_number, file_id FROM episodes WHERE series_id = ? ORDER BY episode_number',
+            (series_id,)
+        )
+
+    @staticmethod
+    def _add_episodes(conn, series_id, file_ids):
+        last = conn.execute(
+            'SELECT COALESCE(MAX(episode_number), 0) FROM episodes WHERE series_id = ?', (series_id,)
+        ).fetchone()[0]
+        numbers = list(range(last + 1, last + 1 + len(file_ids)))
+        conn.executemany(
+            'INSERT INTO episodes (series_id, episode_number, file_id) VALUES (?, ?, ?)',
+            [(series_id, number, file_id) for number, file_id in zip(numbers, file_ids)]
+        )
+        return numbers
+
+    async def add_episodes(self, series_id: int, file_ids) -> list:
+        """Qismlarni ketma-ket raqamlar bilan bitta tranzaksiyada qo'shish; berilgan raqamlarni qaytaradi"""
+        return await self.transaction(self._add_episodes, series_id, file_ids)
+
+    async def _keyset_page(self, table: str, columns: str, after_id: int, before_id: int, limit: int):
+        """id bo'yicha sahifa: (qatorlar, oldingi sahifa bormi, keyingi sahifa bormi)
+
+        OFFSET ishlatilmaydi: har bir sahifa PRIMARY KEY bo'yicha `limit + 1` ta qatorni o'qiydi,
+        ro'yxat qancha katta bo'lmasin. `before_id` berilsa - undan oldingi sahifa.
+        """
+        if before_id is not None:
+            rows = await self.fetchall(
+                f'SELECT {columns} FROM {table} WHERE id < ? ORDER BY id DESC LIMIT ?', (before_id, limit + 1)
+            )
+            return rows[:limit][::-1], len(rows) > limit, True
+
+        rows = await self.fetchall(
+            f'SELECT {columns} FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (after_id, limit + 1)
+        )
+        return rows[:limit], after_id > 0, len(rows) > limit
+
+    async def get_movies_page(self, after_id: int = 0, before_id: int = None, limit: int = 20):
+        """(id, title) qatorlari sahifasi"""
+        return await self._keyset_page('movies', 'id, title', after_id, before_id, limit)
+
+    async def get_total_movies(self) -> int:
+        row = await self.fetchone('SELECT COUNT(*) FROM movies')
+        return row[0]
+
+
+    # Ommaviy xabarlar
+    async def create_broadcast(self, from_chat_id: int, message_id: int, admin_chat_id: int,
+                               progress_message_id: int, total_count: int, active_since: str = None) -> int:
+        broadcast_id, _ = await self.execute('''
+            INSERT INTO broadcasts (from_chat_id, message_id, admin_chat_id, progress_message_id,
+                                    total_count, active_since)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (from_chat_id, message_id, admin_chat_id, progress_message_id, total_count, active_since))
+        return broadcast_id
+
+    async def get_running_broadcasts(self):
+        return await self.fetchall('''
+            SELECT id, from_chat_id, message_id, admin_chat_id, progress_message_id,
+                   last_user_id, total_count, sent_count, failed_count, blocked_count, active_since
+            FROM broadcasts WHERE status = 'running' ORDER BY id
+        ''')
+
+    @staticmethod
+    def _save_broadcast_progress(conn, broadcast_id, last_user_id, sent, failed, blocked, blocked_users, status):
+        conn.executemany('UPDATE users SET is_active = 0 WHERE user_id = ?', [(user_id,) for user_id in blocked_users])
+        conn.execute('''
+            UPDATE broadcasts
+            SET last_user_id = ?, sent_count = ?, failed_count = ?, blocked_count = ?, status = ?,
+                finished_date = CASE WHEN ? = 'running' THEN NULL ELSE CURRENT_TIMESTAMP END
+            WHERE id = ?
+        ''', (last_user_id, sent, failed, blocked, status, status, broadcast_id))
+
+    async def save_broadcast_progress(self, broadcast_id: int, last_user_id: int, sent: int, failed: int,
+                                      blocked: int, blocked_users, status: str = 'running'):
+        """Kursor, hisoblagichlar va bloklagan foydalanuvchilarni bitta tranzaksiyada saqlash"""
+        await self.transaction(
+            self._save_broadcast_progress,
+            broadcast_id, last_user_id, sent, failed, blocked, blocked_users, status
+        )
+
+def utc_timestamp(days_ago: float = 0) -> str:
+    """CURRENT_TIMESTAMP bilan bir xil formatdagi UTC vaqt"""
+    return (datetime.now(timezone.utc) - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ActivityBuffer:
+    """Foydalanuvchi yozuvlarini xotirada yig'ib, bitta tranzaksiyada yozish
+
+    Bir foydalanuvchining ketma-ket yozuvlari bittaga birlashtiriladi; bufer
+    har `interval` soniyada yoki `max_size` ta foydalanuvchi yig'ilganda yoziladi.
+    """
+
+    def __init__(self, db: Database, interval: float = 5.0, max_size: int = 500):
+        self.db = db
+        self.interval = interval
+        self.max_size = max_size
+        self.coalesced = 0
+        self.written = 0
+        self._users = {}
+        self._touches = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flush_task = None
+
+    def upsert(self, user_id: int, username: str, full_name: str):
+        """/start: foydalanuvchini qo'shish yoki ma'lumotlarini yangilash"""
+        if user_id in self._users or self._touches.pop(user_id, None) is not None:
+            self.coalesced += 1
+        self._users[user_id] = (username, full_name, utc_timestamp())
+        self._check_size()
+
+    def touch(self, user_id: int):
+        """Faqat last_active ni yangilash"""
+        now = utc_timestamp()
+        if user_id in self._users:
+            username, full_name, _ = self._users[user_id]
+            self._users[user_id] = (username, full_name, now)
+            self.coalesced += 1
+        else:
+            if user_id in self._touches:
+                self.coalesced += 1
+            self._touches[user_id] = now
+        self._check_size()
+
+    @property
+    def pending(self) -> int:
+        return len(self._users) + len(self._touches)
+
+    def _check_size(self):
+        if self.pending >= self.max_size and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        async with self._lock:
+            if not self.pending:
+                return
+
+            users, self._users = self._users, {}
+            touches, self._touches = self._touches, {}
+            try:
+                await self.db.save_activity(
+                    [(user_id, *values) for user_id, values in users.items()],
+                    [(last_active, user_id) for user_id, last_active in touches.items()]
+                )
+                self.written += len(users) + len(touches)
+            except Exception as e:
+                logging.error(f"Faollik buferini yozishda xatolik: {e}")
+                # Yo'qotmaslik uchun qaytarib qo'yamiz (yangiroq yozuvlar ustun)
+                for user_id, values in users.items():
+                    self._users.setdefault(user_id, values)
+                for user_id, last_active in touches.items():
+                    if user_id not in self._users:
+                        self._touches.setdefault(user_id, last_active)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from database import Database
+
+
+def is_file_error(error: TelegramBadRequest) -> bool:
+    """Xato fayl (file_id) yoki saqlash kanalidagi xabar yo'qolgani sababli bo'lsa True
+
+    "chat not found" kabi boshqa xatolar kinoni buzilgan deb belgilamaydi.
+    """
+    message = error.message.lower()
+    return 'file' in message or 'media_empty' in message or 'message to copy not found' in message
+
+
+class FileVerifier:
+    """Kinolarning file_id larini fonda tekshirish
+
+    Har `interval` soniyada eng uzoq tekshirilmagan `batch_size` ta kino getFile bilan
+    tekshiriladi (20 MB dan katta fayllar uchun "file is too big" - fayl joyida degani).
+    Ishlamay qolganlari bazada belgilanadi va adminlarga bitta xabar bilan yuboriladi.
+    Foydalanuvchiga yuborishda aniqlangan xatolar ham `report` orqali shu yo'ldan o'tadi.
+    """
+
+    def __init__(self, bot: Bot, db: Database, admin_ids, interval: float = 3600,
+                 batch_size: int = 200, delay: float = 0.1):
+        self.bot = bot
+        self.db = db
+        self.admin_ids = admin_ids
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delay = delay
+        self.checked = 0
+        self.broken = 0
+        self._task = None
+
+    async def _check(self, file_id: str):
+        """True - fayl ishlaydi, False - buzilgan, None - aniqlab bo'lmadi (tarmoq va h.k.)"""
+        try:
+            await self.bot.get_file(file_id)
+            return True
+        except TelegramBadRequest as e:
+            if 'too big' in e.message.lower():
+                return True
+            return False if is_file_error(e) else None
+        except Exception as e:
+            logging.warning(f"file_id tekshiruvida xatolik: {e}")
+            return None
+
+    async def check_batch(self) -> int:
+        """Bitta to'plamni tekshirish; yangi buzilganlar sonini qaytaradi"""
+        movies = await self.db.get_movies_to_check(self.batch_size)
+        titles = {}
+        results = []
+        for movie_id, title, file_id in movies:
+            ok = await self._check(file_id)
+            if ok is not None:
+                results.append((movie_id, ok))
+                titles[movie_id] = title
+            await asyncio.sleep(self.delay)
+
+        self.checked += len(results)
+        broken = await self.db.set_file_status(results)
+        await self._report([(movie_id, titles[movie_id]) for movie_id in broken])
+        return len(broken)
+
+    async def report(self, movie, error: Exception):
+        """Yuborishda fayl xatosi chiqdi: kinoni belgilash va (birinchi marta bo'lsa) adminlarga xabar"""
+        logging.error(f"Kino {movie[0]} faylini yuborib bo'lmadi: {error}")
+        if await self.db.set_file_status([(movie[0], False)]):
+            await self._report([(movie[0], movie[1])])
+
+    async def _report(self, movies):
+        if not movies:
+            return
+        self.broken += len(movies)
+
+        lines = [f"⚠️ <b>Fayli ishlamay qolgan kinolar: {len(movies)} ta</b>\n"]
+        lines.extend(f"🎬 <b>{movie_id}</b> - {title}" for movie_id, title in movies[:50])
+        if len(movies) > 50:
+            lines.append(f"\n... va yana {len(movies) - 50} ta")
+        lines.append("\nKinoni o'chirib, faylini qayta yuklang.")
+        text = "\n".join(lines)
+
+        for admin_id in list(self.admin_ids):
+            try:
+                await self.bot.send_message(admin_id, text, parse_mode="HTML")
+            except Exception as e:
+                logging.warning(f"Adminga xabar yuborishda xatolik: {e}")
+
+    async def _check_loop(self):
+        while True:
+            try:
+                await self.check_batch()
+            except Exception as e:
+                logging.error(f"file_id tekshiruvida xatolik: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._check_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,59 @@
+from typing import Any, Dict, Union
+
+from aiogram.filters import Filter
+from aiogram.types import CallbackQuery, Message
+
+
+class AdminFilter(Filter):
+    """Router darajasida bir marta tekshiriladigan admin filtri
+
+    `admin_ids` - har doim bir xil konteyner (ro'yxat/to'plam); unga qo'shilgan
+    yoki undan o'chirilgan ID lar filtrda darhol ko'rinadi.
+    """
+
+    def __init__(self, admin_ids):
+        self.admin_ids = admin_ids
+
+    async def __call__(self, event: Union[Message, CallbackQuery]) -> bool:
+        return event.from_user is not None and event.from_user.id in self.admin_ids
+
+
+class ButtonFilter(Filter):
+    """Tugmani `handlers` lug'atidan qidirish
+
+    Har bir tugma uchun alohida `F.text == ...` tekshirilmaydi - bitta dict
+    qidiruvi. Xabarda kalit - tugma matni, callbackda - `data` ning ":" gacha
+    bo'lgan qismi. Topilgan funksiya handlerga `button_handler` argumenti sifatida beriladi.
+    """
+
+    def __init__(self, handlers: Dict[str, Any]):
+        self.handlers = handlers
+
+    async def __call__(self, event: Union[Message, CallbackQuery]) -> Union[bool, Dict[str, Any]]:
+        if isinstance(event, CallbackQuery):
+            key = event.data.split(':', 1)[0] if event.data else None
+        else:
+            key = event.text
+        handler = self.handlers.get(key)
+        if handler is None:
+            return False
+        return {'button_handler': handler}
+
+
+class TextFilter(Filter):
+    """Matnli xabar (`F.text`)
+
+    aiogram sinxron filtrlarni (jumladan magic filterlarni) thread poolda
+    bajaradi; async filtr esa event loopning o'zida tekshiriladi.
+    """
+
+    async def __call__(self, message: Message) -> bool:
+        return message.text is not None
+
+
+def button(handlers: Dict[str, Any], key: str):
+    """Funksiyani `key` tugmasi (matn yoki callback prefiksi) uchun `handlers` lug'atiga yozib qo'yish"""
+    def decorator(func):
+        handlers[key] = func
+        return func
+    return decorator
@@ -0,0 +1,103 @@
+from typing import Annotated, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+from pydantic import ConfigDict, PlainSerializer
+
+
+# aiogram klaviaturalari o'zgaruvchan (MutableTelegramObject, qatorlar - list). Umumiy
+# obyektlar uchun o'zgarmas nusxalari: maydonlarga qiymat berib bo'lmaydi, qatorlar
+# tuple. Yuborishda qatorlar list ga aylantiriladi - Bot API ga odatdagidek ketadi.
+def _rows_as_lists(rows):
+    return [list(row) for row in rows]
+
+
+class FrozenKeyboardButton(KeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenReplyKeyboardMarkup(ReplyKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+    keyboard: Annotated[Tuple[Tuple[FrozenKeyboardButton, ...], ...], PlainSerializer(_rows_as_lists)]
+
+
+class FrozenInlineKeyboardButton(InlineKeyboardButton):
+    model_config = ConfigDict(frozen=True)
+
+
+class FrozenInlineKeyboardMarkup(InlineKeyboardMarkup):
+    model_config = ConfigDict(frozen=True)
+    inline_keyboard: Annotated[
+        Tuple[Tuple[FrozenInlineKeyboardButton, ...], ...], PlainSerializer(_rows_as_lists)
+    ]
+
+
+def _reply_keyboard(*rows) -> FrozenReplyKeyboardMarkup:
+    return FrozenReplyKeyboardMarkup(
+        keyboard=tuple(tuple(FrozenKeyboardButton(text=text) for text in row) for row in rows),
+        resize_keyboard=True
+    )
+
+
+# Klaviaturalar bir marta yaratiladi va har bir javobda qayta ishlatiladi.
+# Ular o'zgarmas: bitta javob uchun o'zgartirilsa keyingi javoblarga ham ta'sir qilardi.
+MAIN_MENU_KEYBOARD = _reply_keyboard(
+    ["📝 Kino kodini kiritish"],
+)
+
+ADMIN_KEYBOARD = _reply_keyboard(
+    ["🎬 Kino qo'shish", "🗑 Kino o'chirish"],
+    ["📊 Statistika", "📢 Kanallar boshqaruvi"],
+    ["📨 Barchaga xabar yuborish", "📋 Kino ro'yxati"],
+    ["📺 Serial qo'shish", "➕ Qism qo'shish"],
+    ["⚠️ Buzilgan fayllar", "🔙 Asosiy menyu"],
+)
+
+CHANNELS_KEYBOARD = _reply_keyboard(
+    ["➕ Kanal qo'shish", "🗑 Kanal o'chirish"],
+    ["📋 Kanallar ro'yxati", "🔙 Orqaga"],
+)
+
+CANCEL_KEYBOARD = _reply_keyboard(
+    ["❌ Bekor qilish"],
+)
+
+EPISODES_UPLOAD_KEYBOARD = _reply_keyboard(
+    ["✅ Tayyor", "❌ Bekor qilish"],
+)
+
+# Reply tugmalarining matnlari - kino kodi/qidiruv sifatida qabul qilinmaydi
+MENU_BUTTONS = frozenset(
+    button.text
+    for keyboard in (MAIN_MENU_KEYBOARD, ADMIN_KEYBOARD, CHANNELS_KEYBOARD, CANCEL_KEYBOARD, EPISODES_UPLOAD_KEYBOARD)
+    for row in keyboard.keyboard
+    for button in row
+)
+
+
+class SubscriptionKeyboards:
+    """Obuna bo'lish klaviaturalari keshi
+
+    Klaviatura faqat obuna bo'linmagan kanallar to'plamiga bog'liq. Kanallar
+    qo'shilganda yoki o'chirilganda `invalidate()` keshni tozalaydi.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def get(self, not_subscribed) -> FrozenInlineKeyboardMarkup:
+        key = tuple(channel['username'] for channel in not_subscribed)
+        keyboard = self._data.get(key)
+        if keyboard is None:
+            keyboard = self._data[key] = FrozenInlineKeyboardMarkup(inline_keyboard=(
+                *((FrozenInlineKeyboardButton(text=f"📢 {channel['username']}", url=channel['url']),)
+                  for channel in not_subscribed),
+                (FrozenInlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription"),)
+            ))
+        return keyboard
+
+    def invalidate(self):
+        self._data.clear()
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
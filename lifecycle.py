@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+
+class Lifecycle:
+    """Fon vazifalari va qayta ishlanayotgan updatelar hisobi
+
+    Qayta ishlanayotgan updatelar LifecycleMiddleware orqali sanaladi. `spawn` orqali
+    yaratilgan vazifalar (albomlar, webhook updatelari, ishga tushishdagi isitish)
+    kuzatib boriladi. To'xtashda `close` yangi updatelarni qabul qilishni to'xtatadi,
+    `drain` esa boshlanganlarini `timeout` gacha kutadi va ulgurmaganlarini bekor qiladi.
+    """
+
+    def __init__(self):
+        self.accepting = True
+        self.cancelled = 0
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = set()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def tasks(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro, name: str = None) -> asyncio.Task:
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._done)
+        return task
+
+    def _done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Fon vazifasi xatosi ({task.get_name()}): {task.exception()}")
+
+    def enter(self):
+        self._in_flight += 1
+        self._idle.clear()
+
+    def exit(self):
+        self._in_flight -= 1
+        if not self._in_flight:
+            self._idle.set()
+
+    def close(self):
+        """Yangi updatelarni qabul qilishni to'xtatish (webhook 503 qaytaradi)"""
+        self.accepting = False
+
+    async def drain(self, timeout: float):
+        """Boshlangan updatelar va fon vazifalarini `timeout` soniya ichida tugatish"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Polling oxirgi javobidagi updatelar uchun yaratilgan vazifalar ishga tushib olsin
+        await asyncio.sleep(0)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{self._in_flight} ta update {timeout} soniyada tugamadi")
+
+        tasks = list(self._tasks)
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - loop.time()))
+        for task in pending:
+            task.cancel()
+        self.cancelled += len(pending)
+        if pending:
+            logging.warning(f"{len(pending)} ta fon vazifasi bekor qilindi")
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+class LifecycleMiddleware(BaseMiddleware):
+    """Tashqi (outer) update middleware: qayta ishlanayotgan updatelarni sanash"""
+
+    def __init__(self, lifecycle: Lifecycle):
+        self.lifecycle = lifecycle
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        self.lifecycle.enter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.lifecycle.exit()
@@ -1,35 +1,132 @@
 import asyncio
-import sqlite3
+import csv
 import logging
 import os
 import aiohttp
+import hmac
 import html
-from datetime import datetime
-from aiogram import Bot, Dispatcher, types, F
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, CallbackQuery
-from aiogram.filters import Command, CommandStart
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from aiogram import Bot, Dispatcher, Router, types, F
+from aiogram.types import FSInputFile, Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from aiogram.types import InlineQuery, InlineQueryResultCachedVideo, InlineQueryResultsButton, InputMediaVideo
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject, CommandStart, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.exceptions import TelegramBadRequest, TelegramNetworkError
 from dotenv import load_dotenv
-from functools import wraps
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 import uvicorn
-
-app = FastAPI()
-
-@app.get("/")
-async def root():
-    return {"status": "Bot ishga tayyor"}
-
-if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 8000)))
+from broadcast import BroadcastEngine
+from catalog import FORMATS, MovieWriter, detect_format, read_movies
+from cache import MovieCache, SubscriptionCache, TTLCache
+from database import ActivityBuffer, Database, utc_timestamp
+from filecheck import FileVerifier, is_file_error
+from filters import AdminFilter, ButtonFilter, TextFilter, button
+from lifecycle import Lifecycle, LifecycleMiddleware
+from keyboards import (
+    ADMIN_KEYBOARD, CANCEL_KEYBOARD, CHANNELS_KEYBOARD, EPISODES_UPLOAD_KEYBOARD, MAIN_MENU_KEYBOARD, MENU_BUTTONS,
+    SubscriptionKeyboards
+)
+from metrics import (
+    HandlerMetricsMiddleware, Registry, RequestMetricsMiddleware, UpdateMetricsMiddleware, instrument
+)
+from middlewares import ThrottlingMiddleware, UpdateDedupMiddleware
+from notifications import NewUserDigest
+from ratelimit import RateLimitMiddleware, SlidingWindow
+from storage import SQLiteStorage
 
 # Sozlamalar
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
-ADMIN_IDS = [7384369025]  # Sizning ID ingiz
+ADMIN_IDS = [7384369025]  # Bosh adminlar (o'chirib bo'lmaydi); qolganlari bazadagi admins jadvalida
+DB_PATH = os.getenv('DB_PATH', 'movies.db')
+PORT = int(os.environ.get("PORT", 8000))
+# Bot API manzili: o'zimizning Bot API server yoki yuklama testi uchun soxta server (benchmarks/fake_api.py)
+BOT_API_URL = os.getenv('BOT_API_URL')
+# FSM holatlari: "sqlite" (bir nechta jarayon uchun, qayta ishga tushishda saqlanadi) yoki "memory"
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', 86400))
+
+# Ishga tushirish rejimi: "webhook" (WEBHOOK_URL kerak) yoki "polling"
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Bir xil update_id ni qayta ishlamaslik (bir nechta worker bitta webhookni bo'lishganda).
+# Odatda faqat webhook rejimida: pollingda Telegram updateni qayta yubormaydi, tekshiruv esa
+# har bir updatega bitta yozuv qo'shadi
+UPDATE_DEDUP = os.getenv('UPDATE_DEDUP', '1' if BOT_MODE == 'webhook' else '0') == '1'
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # masalan: https://bot.example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+# Webhook rejimida majburiy (A-Z, a-z, 0-9, _ va -, 1-256 belgi): usiz WEBHOOK_PATH ga
+# istalgan kishi soxta update (masalan, admin nomidan) yubora olardi
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+# Ishga tushishda Telegram navbatidagi updatelarni tashlab yuborish (webhook ham, polling ham).
+# Odatda 0: bot to'xtab turganda yoki rolling restartda (oldingi replika 503 qaytargan)
+# kelgan updatelar yo'qolmasligi kerak
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', '0') == '1'
+# To'xtashda webhookni o'chirish (faqat bitta nusxa ishlasa va bot butunlay to'xtatilsa 1 qiling);
+# replikalardan biri to'xtashi boshqalariga keladigan updatelarni uzib qo'ymasligi kerak
+WEBHOOK_DELETE_ON_SHUTDOWN = os.getenv('WEBHOOK_DELETE_ON_SHUTDOWN', '0') == '1'
+# /metrics: berilsa faqat "Authorization: Bearer <token>" bilan ochiladi
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+# To'xtash (SIGTERM) paytida boshlangan handlerlar va ommaviy xabarlarni kutish chegarasi, soniya
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+
+# Foydalanuvchi faolligi buferi: har necha soniyada / nechta yozuvda bazaga yoziladi
+ACTIVITY_FLUSH_INTERVAL = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 5))
+ACTIVITY_FLUSH_SIZE = int(os.getenv('ACTIVITY_FLUSH_SIZE', 500))
+# Ommaviy xabar: parallel workerlar soni (tezlik API_GLOBAL_RATE bilan cheklanadi)
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', 10))
+# Chiquvchi so'rovlar limiti: umumiy va bitta chat uchun soniyasiga nechta so'rov
+API_GLOBAL_RATE = float(os.getenv('API_GLOBAL_RATE', 30))
+API_CHAT_RATE = float(os.getenv('API_CHAT_RATE', 1))
+API_MAX_ATTEMPTS = int(os.getenv('API_MAX_ATTEMPTS', 3))
+# Flood himoyasi: bitta foydalanuvchidan THROTTLE_WINDOW soniyada nechta xabar/tugma qabul qilinadi;
+# "Obunani tekshirish" har safar barcha kanallarni API orqali tekshiradi, unga qattiqroq limit
+THROTTLE_LIMIT = int(os.getenv('THROTTLE_LIMIT', 10))
+THROTTLE_WINDOW = float(os.getenv('THROTTLE_WINDOW', 10))
+SUBSCRIPTION_CHECK_LIMIT = int(os.getenv('SUBSCRIPTION_CHECK_LIMIT', 2))
+SUBSCRIPTION_CHECK_WINDOW = float(os.getenv('SUBSCRIPTION_CHECK_WINDOW', 10))
+
+# Yangi foydalanuvchilar haqida adminlarga yig'ma xabar: necha soniyada bir, nechta yig'ilsa
+# kutmasdan yuboriladi va xabarda nechta foydalanuvchi ro'yxat qilib ko'rsatiladi
+NOTIFY_INTERVAL = float(os.getenv('NOTIFY_INTERVAL', 60))
+NOTIFY_THRESHOLD = int(os.getenv('NOTIFY_THRESHOLD', 1000))
+NOTIFY_MAX_LISTED = int(os.getenv('NOTIFY_MAX_LISTED', 20))
+
+# Obuna keshi muddatlari (soniya): a'zo bo'lganlar uzoqroq, a'zo bo'lmaganlar qisqa saqlanadi
+SUBSCRIPTION_POSITIVE_TTL = int(os.getenv('SUBSCRIPTION_POSITIVE_TTL', 600))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv('SUBSCRIPTION_NEGATIVE_TTL', 30))
+# Bir vaqtda nechta kanal a'zoligi so'rovi yuborilishi mumkin
+CHANNEL_CHECK_CONCURRENCY = int(os.getenv('CHANNEL_CHECK_CONCURRENCY', 10))
+# Kino keshi hajmi va ishga tushishda oldindan yuklanadigan oxirgi kinolar soni (0 - o'chirilgan)
+MOVIE_CACHE_SIZE = int(os.getenv('MOVIE_CACHE_SIZE', 1000))
+MOVIE_CACHE_WARMUP = int(os.getenv('MOVIE_CACHE_WARMUP', 100))
+# Qidiruv: chatda ko'rsatiladigan natijalar soni, inline rejimda sahifa hajmi va kesh muddati
+SEARCH_RESULTS_LIMIT = int(os.getenv('SEARCH_RESULTS_LIMIT', 10))
+INLINE_PAGE_SIZE = int(os.getenv('INLINE_PAGE_SIZE', 20))
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 300))
+# Serial qismlari klaviaturasida bir sahifadagi tugmalar soni
+EPISODES_PAGE_SIZE = 20
+# Saqlash kanali (ixtiyoriy): bot admin bo'lgan yopiq kanal ID si, masalan -1001234567890.
+# Berilsa yangi kinolar shu kanalga nusxalanadi va foydalanuvchiga copy_message bilan yuboriladi
+STORAGE_CHANNEL_ID = int(os.getenv('STORAGE_CHANNEL_ID', 0)) or None
+# file_id tekshiruvi: necha soniyada bir va bir martada nechta kino (0 - o'chirilgan)
+FILE_CHECK_INTERVAL = float(os.getenv('FILE_CHECK_INTERVAL', 3600))
+FILE_CHECK_BATCH = int(os.getenv('FILE_CHECK_BATCH', 200))
+# Admin ro'yxatlari (kinolar, kanallar): bir sahifadagi qatorlar soni
+LIST_PAGE_SIZE = int(os.getenv('LIST_PAGE_SIZE', 20))
+# Ommaviy import: bitta tranzaksiyada nechta kino yoziladi
+IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', 500))
+# Boshqa jarayonlarda o'zgargan adminlar va kinolar necha soniyada keshlarga yetib keladi
+CACHE_SYNC_INTERVAL = float(os.getenv('CACHE_SYNC_INTERVAL', 5))
+# Albom (media group) qismlari kelib bo'lishini kutish vaqti
+ALBUM_WAIT = 1.0
 
 # Loggerni sozlash
 logging.basicConfig(
@@ -39,68 +136,123 @@ logging.basicConfig(
 
 # Botni yaratish
 try:
-    bot = Bot(token=BOT_TOKEN)
+    session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None
+    bot = Bot(token=BOT_TOKEN, session=session)
 except Exception as e:
     logging.error(f"Bot yaratishda xatolik: {e}")
     exit(1)
 
-dp = Dispatcher(storage=MemoryStorage())
+rate_limiter = RateLimitMiddleware(
+    global_rate=API_GLOBAL_RATE,
+    chat_rate=API_CHAT_RATE,
+    max_attempts=API_MAX_ATTEMPTS
+)
+bot.session.middleware(rate_limiter)
+
+# Metrikalar (/metrics da Prometheus formatida)
+metrics = Registry()
+update_counter = metrics.counter('bot_updates_total', 'Kelgan updatelar soni', 'type')
+update_latency = metrics.histogram('bot_update_duration_seconds', 'Updateni qayta ishlash vaqti', 'type')
+handler_latency = metrics.histogram('bot_handler_duration_seconds', 'Handler ishlash vaqti', 'handler')
+handler_errors = metrics.counter('bot_handler_errors_total', 'Handler xatolari', 'handler')
+api_latency = metrics.histogram('bot_api_request_duration_seconds', 'Telegram API so\'rovi vaqti', 'method')
+api_errors = metrics.counter('bot_api_errors_total', 'Telegram API xatolari', 'method')
+db_latency = metrics.histogram('bot_db_query_duration_seconds', 'Baza metodlari vaqti', 'query')
+# Limitdan keyin: faqat Telegramning o'z javob vaqti o'lchanadi (navbatda kutish emas)
+bot.session.middleware(RequestMetricsMiddleware(api_latency, api_errors))
+
+db = Database(DB_PATH)
+# Quyi darajadagi metodlar o'lchanmaydi: ular yordamchi metodlar ichida chaqiriladi va
+# aks holda bitta so'rov ikki label bilan ikki marta sanalardi. Ularni to'g'ridan-to'g'ri
+# chaqiradigan FSM storage o'z metodlari nomi bilan ("fsm_" label) o'lchanadi
+instrument(db, db_latency, exclude=('execute', 'fetchone', 'fetchall', 'transaction'))
+if FSM_STORAGE == 'sqlite':
+    fsm_storage = SQLiteStorage(db, ttl=FSM_STATE_TTL)
+    instrument(fsm_storage, db_latency, prefix='fsm_')
+else:
+    fsm_storage = MemoryStorage()
+dp = Dispatcher(storage=fsm_storage)
+# Eng tashqi middleware: to'xtashda qayta ishlanayotgan updatelar tugashini kutish uchun
+lifecycle = Lifecycle()
+dp.update.outer_middleware(LifecycleMiddleware(lifecycle))
+dp.update.outer_middleware(UpdateMetricsMiddleware(update_counter, update_latency))
+handler_metrics = HandlerMetricsMiddleware(handler_latency, handler_errors)
+for event_name, observer in dp.observers.items():
+    if event_name not in ('update', 'error'):
+        observer.middleware(handler_metrics)
+# Adminlar to'plami: bosh adminlar + admins jadvali (ishga tushishda yuklanadi)
+admin_ids = set(ADMIN_IDS)
+# Flood himoyasi dedup va FSM dan oldin: tashlangan xabar uchun baza va API ga murojaat bo'lmaydi.
+# Dispatcher FSM middleware ini o'zi birinchi qo'shadi, shuning uchun u oxiriga ko'chiriladi
+# (unga faqat undan oldin turadigan UserContextMiddleware kerak)
+throttling = ThrottlingMiddleware(
+    SlidingWindow(THROTTLE_LIMIT, THROTTLE_WINDOW),
+    callbacks={"check_subscription": SlidingWindow(SUBSCRIPTION_CHECK_LIMIT, SUBSCRIPTION_CHECK_WINDOW)},
+    exempt=admin_ids
+)
+dp.update.outer_middleware.unregister(dp.fsm)
+dp.update.outer_middleware(throttling)
+update_dedup = UpdateDedupMiddleware(db)
+if UPDATE_DEDUP:
+    dp.update.outer_middleware(update_dedup)
+dp.update.outer_middleware(dp.fsm)
+activity_buffer = ActivityBuffer(db, interval=ACTIVITY_FLUSH_INTERVAL, max_size=ACTIVITY_FLUSH_SIZE)
+broadcast_engine = BroadcastEngine(bot, db, workers=BROADCAST_WORKERS)
+
+subscription_cache = SubscriptionCache(
+    positive_ttl=SUBSCRIPTION_POSITIVE_TTL,
+    negative_ttl=SUBSCRIPTION_NEGATIVE_TTL
+)
+channel_check_semaphore = asyncio.Semaphore(CHANNEL_CHECK_CONCURRENCY)
+channel_resolve_lock = asyncio.Lock()
+# Aniqlanmagan kanallar: username -> (keyingi urinish vaqti, kutish). Har xatoda kutish ikki baravar oshadi
+channel_resolve_retry = {}
+CHANNEL_RESOLVE_BACKOFF = 60
+CHANNEL_RESOLVE_MAX_BACKOFF = 3600
+movie_cache = MovieCache(max_size=MOVIE_CACHE_SIZE)
+new_user_digest = NewUserDigest(
+    bot, db, admin_ids,
+    interval=NOTIFY_INTERVAL,
+    threshold=NOTIFY_THRESHOLD,
+    max_listed=NOTIFY_MAX_LISTED
+)
+file_verifier = FileVerifier(bot, db, admin_ids, interval=FILE_CHECK_INTERVAL, batch_size=FILE_CHECK_BATCH)
+subscription_keyboards = SubscriptionKeyboards()
+# Jami sonlar (COUNT(*)) admin tugmani tez-tez bossa ham minutiga bir martadan ko'p hisoblanmaydi
+totals_cache = TTLCache(ttl=60)
+
+# O'sib boradigan sonlar - counter (_total), joriy holat - gauge
+metrics.func_counter('bot_subscription_cache_hits_total', 'Obuna keshi: topildi', lambda: subscription_cache.hits)
+metrics.func_counter(
+    'bot_subscription_cache_misses_total', 'Obuna keshi: topilmadi', lambda: subscription_cache.misses
+)
+metrics.gauge('bot_subscription_cache_size', 'Obuna keshidagi yozuvlar', lambda: subscription_cache.size)
+metrics.func_counter('bot_movie_cache_hits_total', 'Kino keshi: topildi', lambda: movie_cache.hits)
+metrics.func_counter('bot_movie_cache_misses_total', 'Kino keshi: topilmadi', lambda: movie_cache.misses)
+metrics.gauge('bot_movie_cache_size', 'Kino keshidagi yozuvlar', lambda: movie_cache.size)
+metrics.gauge('bot_activity_buffer_pending', 'Bazaga yozilmagan faollik yozuvlari', lambda: activity_buffer.pending)
+metrics.gauge('bot_broadcasts_running', 'Ishlayotgan ommaviy xabarlar', lambda: broadcast_engine.running)
+metrics.func_counter(
+    'bot_api_throttled_total', 'Limit sabab navbat kutgan so\'rovlar', lambda: rate_limiter.throttled
+)
+metrics.func_counter('bot_api_retried_total', 'Qayta yuborilgan so\'rovlar', lambda: rate_limiter.retried)
+metrics.func_counter('bot_api_dropped_total', 'Urinishlar tugab tashlangan so\'rovlar', lambda: rate_limiter.dropped)
+metrics.func_counter('bot_updates_duplicate_total', 'Takroriy update_id lar', lambda: update_dedup.skipped)
+metrics.func_counter('bot_files_checked_total', 'Tekshirilgan file_id lar', lambda: file_verifier.checked)
+metrics.func_counter(
+    'bot_files_broken_total', 'Ishlamay qolgan deb topilgan fayllar', lambda: file_verifier.broken
+)
+metrics.gauge('bot_updates_in_flight', 'Hozir qayta ishlanayotgan updatelar', lambda: lifecycle.in_flight)
+metrics.gauge('bot_background_tasks', 'Kuzatilayotgan fon vazifalari', lambda: lifecycle.tasks)
+metrics.func_counter(
+    'bot_updates_throttled_total', 'Flood himoyasi tashlagan xabar va tugmalar', lambda: throttling.dropped
+)
 
 # Xavfsizlik funksiyalari
 def clean_input(text: str) -> str:
     """Xavfli belgilarni olib tashlash"""
     return html.escape(text.strip())
 
-# Ma'lumotlar bazasi funksiyalari
-def create_db():
-    try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS movies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                file_id TEXT NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE,
-                username TEXT,
-                full_name TEXT,
-                joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_active TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS channels (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE,
-                url TEXT,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Dastlabki kanalni qo'shish
-        cursor.execute('''
-            INSERT OR IGNORE INTO channels (username, url) 
-            VALUES (?, ?)
-        ''', ('football_zoneX', 'https://t.me/football_zoneX'))
-        
-        conn.commit()
-        conn.close()
-        logging.info("Ma'lumotlar bazasi yaratildi")
-    except Exception as e:
-        logging.error(f"Ma'lumotlar bazasini yaratishda xatolik: {e}")
-
-create_db()
-
 # FSM holatlari
 class AdminStates(StatesGroup):
     waiting_for_movie_title = State()
@@ -111,139 +263,291 @@ class AdminStates(StatesGroup):
     waiting_for_channel_username = State()
     waiting_for_channel_url = State()
     waiting_for_delete_channel = State()
+    waiting_for_series_title = State()
+    waiting_for_series_description = State()
+    waiting_for_series_code = State()
+    waiting_for_episodes = State()
+    waiting_for_import = State()
+
+# Routerlar: update avval admin holatlari (FSM), keyin admin paneli, so'ng foydalanuvchi
+# handlerlaridan o'tadi. Admin filtri har bir handlerda emas, router darajasida bir marta tekshiriladi.
+admin_filter = AdminFilter(admin_ids)
+fsm_router = Router(name="admin_fsm")
+fsm_router.message.filter(StateFilter(AdminStates), admin_filter)
+admin_router = Router(name="admin")
+admin_router.message.filter(admin_filter)
+admin_router.callback_query.filter(admin_filter)
+user_router = Router(name="user")
+dp.include_routers(fsm_router, admin_router, user_router)
+
+# Tugma matni (yoki callback prefiksi) -> handler
+admin_buttons = {}
+admin_callbacks = {}
+user_buttons = {}
+user_callbacks = {}
+
+# Tugmalar matn (callbackda prefiks) bo'yicha bitta dict qidiruvi bilan topiladi.
+# Bu handlerlar umumiy matn handleridan (handle_movie_number) oldin ro'yxatdan o'tadi.
+@admin_router.message(ButtonFilter(admin_buttons))
+async def admin_button_handler(message: Message, state: FSMContext, button_handler):
+    await button_handler(message, state)
+
+@admin_router.callback_query(ButtonFilter(admin_callbacks))
+async def admin_callback_handler(callback: CallbackQuery, button_handler):
+    await button_handler(callback)
+
+@user_router.message(ButtonFilter(user_buttons))
+async def user_button_handler(message: Message, state: FSMContext, button_handler):
+    await button_handler(message, state)
+
+@user_router.callback_query(ButtonFilter(user_callbacks))
+async def user_callback_handler(callback: CallbackQuery, button_handler):
+    await button_handler(callback)
+
+# Admin bo'lmaganlar admin buyruqlarini yuborsa
+@user_router.message(Command(
+    "admin", "broadcast", "export_users", "export_movies", "import_movies", "admins", "add_admin", "remove_admin"
+))
+async def not_admin_handler(message: Message):
+    await message.answer("❌ Siz admin emassiz!")
 
 # Helper funksiyalari
-def get_admin_ids():
-    return ADMIN_IDS
+async def load_admins():
+    """Adminlar to'plamini bazadan yangilash
 
-def get_channels():
-    try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT username, url FROM channels')
-        channels = cursor.fetchall()
-        conn.close()
-        return [{"username": channel[0], "url": channel[1]} for channel in channels]
-    except:
-        return []
+    To'plam obyektining o'zi almashtirilmaydi - AdminFilter va NewUserDigest shu obyektni ishlatadi.
+    """
+    ids = await db.get_admin_ids() | set(ADMIN_IDS)
+    admin_ids.intersection_update(ids)
+    admin_ids.update(ids)
 
-def get_all_users():
+# Kino qidirish (avval keshdan)
+async def get_movie(movie_id: int):
+    movie = movie_cache.get(movie_id)
+    if movie is None:
+        movie = await db.get_movie(movie_id)
+        if movie:
+            movie_cache.set(movie_id, movie)
+    return movie
+
+async def send_movie(chat_id: int, movie_id: int) -> bool:
+    """Kinoni yuborish; bunday kino bo'lmasa False
+
+    movie[4] - bazada tayyorlab qo'yilgan caption (HTML). Saqlash kanalidagi xabar
+    (movie[5]) caption bilan birga nusxalanadi; u yo'qolgan bo'lsa kino file_id orqali
+    yuboriladi. Ikkala yo'l ham ishlamasagina kino buzilgan deb belgilanadi.
+    """
+    movie = await get_movie(movie_id)
+    if not movie:
+        return False
+    
+    if STORAGE_CHANNEL_ID and movie[5]:
+        try:
+            await bot.copy_message(chat_id, STORAGE_CHANNEL_ID, movie[5])
+            return True
+        except TelegramBadRequest as e:
+            if not is_file_error(e):
+                raise
+            # Kanal xabari o'chirilgan: keyingi safar to'g'ridan-to'g'ri file_id ishlatiladi
+            logging.warning(f"Kino {movie_id} saqlash kanalidan nusxalanmadi: {e}")
+            await db.set_storage_message_id(movie_id, None)
+            movie_cache.invalidate(movie_id)
+    
     try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_id FROM users')
-        users = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return users
-    except:
-        return []
+        await bot.send_video(chat_id=chat_id, video=movie[3], caption=movie[4], parse_mode="HTML")
+    except TelegramBadRequest as e:
+        if not is_file_error(e):
+            raise
+        await file_verifier.report(movie, e)
+        await bot.send_message(chat_id, "⚠️ Bu kino fayli vaqtincha mavjud emas. Adminlarga xabar berildi.")
+    return True
 
-def get_movies_list():
+async def warm_up_movie_cache():
+    if MOVIE_CACHE_WARMUP <= 0:
+        return
+    
     try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, title FROM movies ORDER BY id')
-        movies = cursor.fetchall()
-        conn.close()
-        return movies
-    except:
-        return []
+        # Eng eskisidan boshlab qo'shamiz, shunda eng yangilari LRU da oxirgi bo'ladi
+        for movie in reversed(await db.get_recent_movies(MOVIE_CACHE_WARMUP)):
+            movie_cache.set(movie[0], movie)
+        logging.info(f"Kino keshi isitildi: {movie_cache.size} ta kino")
+    except Exception as e:
+        logging.error(f"Kino keshini isitishda xatolik: {e}")
 
-def get_monthly_users():
+# Kanal reyestri: username -> raqamli chat ID
+async def resolve_channel(channel_username: str):
+    """Kanal username ini chat ID ga aylantirish (xatolikda None)"""
     try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        first_day_of_month = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        cursor.execute('SELECT COUNT(*) FROM users WHERE joined_date >= ?', (first_day_of_month.isoformat(),))
-        monthly_users = cursor.fetchone()[0]
-        conn.close()
-        return monthly_users
-    except:
-        return 0
+        if channel_username.startswith('@'):
+            channel_username = channel_username[1:]
+        
+        chat = await bot.get_chat(f"@{channel_username}")
+        return chat.id
+    except Exception as e:
+        logging.warning(f"Kanalni aniqlashda xatolik {channel_username}: {str(e)[:100]}")
+        return None
+
+async def get_resolved_channels():
+    """Kanallar ro'yxati; chat ID si yo'q eski yozuvlar bir marta aniqlanib saqlanadi
+
+    Aniqlab bo'lmagan kanal (getChat xatosi) backoff bilan qayta uriniladi: navbati
+    kelmagan bo'lsa obuna tekshiruvi lock ham, API so'rovi ham kutmaydi.
+    """
+    channels = await db.get_channels()
+    if not any(resolve_due(channel) for channel in channels):
+        return channels
+
+    # Bir vaqtda kelgan so'rovlar kanalni qayta-qayta getChat qilmasligi uchun bittadan aniqlanadi
+    async with channel_resolve_lock:
+        channels = await db.get_channels()
+        for channel in channels:
+            if not resolve_due(channel):
+                continue
+            username = channel['username']
+            channel['chat_id'] = await resolve_channel(username)
+            if channel['chat_id'] is not None:
+                channel_resolve_retry.pop(username, None)
+                await db.set_channel_chat_id(username, channel['chat_id'])
+            else:
+                _, backoff = channel_resolve_retry.get(username, (0, CHANNEL_RESOLVE_BACKOFF / 2))
+                backoff = min(backoff * 2, CHANNEL_RESOLVE_MAX_BACKOFF)
+                channel_resolve_retry[username] = (time.monotonic() + backoff, backoff)
+    return channels
+
+def resolve_due(channel: dict) -> bool:
+    """Kanal chat ID si yo'q va qayta aniqlash navbati kelgan"""
+    if channel['chat_id'] is not None:
+        return False
+    retry = channel_resolve_retry.get(channel['username'])
+    return retry is None or retry[0] <= time.monotonic()
 
-def get_total_users():
+async def fetch_channel_membership(user_id: int, channel: dict) -> bool:
+    if channel['chat_id'] is None:
+        return False
+    
     try:
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM users')
-        total_users = cursor.fetchone()[0]
-        conn.close()
-        return total_users
-    except:
-        return 0
+        async with channel_check_semaphore:
+            member = await bot.get_chat_member(channel['chat_id'], user_id)
+        is_member = member.status not in ['left', 'kicked']
+        subscription_cache.set(user_id, channel['chat_id'], is_member)
+        return is_member
+    except Exception as e:
+        logging.warning(f"Kanal tekshirishda xatolik {channel['username']}: {str(e)[:100]}")
+        return False
 
 # Kanallarga obuna tekshirish
-async def check_user_subscription(user_id: int):
-    channels = get_channels()
+async def check_user_subscription(user_id: int, force: bool = False):
+    channels = await get_resolved_channels()
     if not channels:
         return []
     
-    not_subscribed = []
+    membership = {}
+    pending = []
     for channel in channels:
-        try:
-            channel_username = channel['username']
-            if channel_username.startswith('@'):
-                channel_username = channel_username[1:]
-            
-            chat = await bot.get_chat(f"@{channel_username}")
-            member = await chat.get_member(user_id)
-            if member.status in ['left', 'kicked']:
-                not_subscribed.append(channel)
-        except Exception as e:
-            logging.warning(f"Kanal tekshirishda xatolik {channel['username']}: {str(e)[:100]}")
-            not_subscribed.append(channel)
+        is_member = None if force else subscription_cache.get(user_id, channel['chat_id'])
+        if is_member is None:
+            pending.append(channel)
+        else:
+            membership[channel['username']] = is_member
     
-    return not_subscribed
+    # Keshda yo'q kanallar bir vaqtda tekshiriladi
+    if pending:
+        results = await asyncio.gather(*(fetch_channel_membership(user_id, channel) for channel in pending))
+        for channel, is_member in zip(pending, results):
+            membership[channel['username']] = is_member
+    
+    return [channel for channel in channels if not membership[channel['username']]]
 
 # Bot admin tekshirishi
-async def is_bot_admin_in_channel(channel_username: str) -> bool:
+async def is_bot_admin_in_channel(chat_id: int) -> bool:
     try:
-        if channel_username.startswith('@'):
-            channel_username = channel_username[1:]
-        
-        chat = await bot.get_chat(f"@{channel_username}")
-        bot_member = await chat.get_member((await bot.get_me()).id)
+        bot_member = await bot.get_chat_member(chat_id, bot.id)
         return bot_member.status in ['administrator', 'creator']
     except Exception as e:
         logging.error(f"Bot adminligini tekshirishda xatolik: {e}")
         return False
 
 # Keyboardlar
-def get_main_menu_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📝 Kino kodini kiritish")]
-        ],
-        resize_keyboard=True
-    )
+def get_episodes_keyboard(series_id: int, numbers, page: int, total: int):
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
+    for start in range(0, len(numbers), 5):
+        keyboard.inline_keyboard.append([
+            InlineKeyboardButton(text=str(number), callback_data=f"ep:{series_id}:{number}")
+            for number in numbers[start:start + 5]
+        ])
+    
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"eps:{series_id}:{page - 1}"))
+    if (page + 1) * EPISODES_PAGE_SIZE < total:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"eps:{series_id}:{page + 1}"))
+    if navigation:
+        keyboard.inline_keyboard.append(navigation)
+    
+    keyboard.inline_keyboard.append([
+        InlineKeyboardButton(text="📦 Barcha qismlarni yuborish", callback_data=f"epall:{series_id}")
+    ])
+    return keyboard
 
-def get_admin_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="🎬 Kino qo'shish"), KeyboardButton(text="🗑 Kino o'chirish")],
-            [KeyboardButton(text="📊 Statistika"), KeyboardButton(text="📢 Kanallar boshqaruvi")],
-            [KeyboardButton(text="📨 Barchaga xabar yuborish"), KeyboardButton(text="📋 Kino ro'yxati")],
-            [KeyboardButton(text="🔙 Asosiy menyu")]
-        ],
-        resize_keyboard=True
-    )
+def list_page(prefix: str, header: str, rows, lines, has_prev: bool, has_next: bool, backward: bool = False):
+    """Ro'yxat sahifasi: matn va ⬅️/➡️ klaviaturasi
 
-def get_channels_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="➕ Kanal qo'shish"), KeyboardButton(text="🗑 Kanal o'chirish")],
-            [KeyboardButton(text="📋 Kanallar ro'yxati"), KeyboardButton(text="🔙 Orqaga")]
-        ],
-        resize_keyboard=True
-    )
+    Qatorlar butunligicha qo'shiladi (HTML teg o'rtasidan bo'linmaydi); 4000 belgiga
+    sig'maganlari keyingi (orqaga yurilganda - oldingi) sahifaga qoladi.
+    Tugmalarda kursor - sahifadagi birinchi/oxirgi id.
+    """
+    size = len(header)
+    count = 0
+    for line in (reversed(lines) if backward else lines):
+        size += len(line) + 1
+        if size > 4000 and count:
+            break
+        count += 1
+    
+    if count < len(lines):
+        if backward:
+            rows, lines, has_prev = rows[-count:], lines[-count:], True
+        else:
+            rows, lines, has_next = rows[:count], lines[:count], True
+    
+    navigation = []
+    if has_prev:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"{prefix}:prev:{rows[0][0]}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"{prefix}:next:{rows[-1][0]}"))
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[navigation]) if navigation else None
+    return "\n".join([header, *lines]), keyboard
 
-def get_cancel_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="❌ Bekor qilish")]
-        ],
-        resize_keyboard=True
-    )
+async def movies_page(after_id: int = 0, before_id: int = None):
+    rows, has_prev, has_next = await db.get_movies_page(after_id, before_id, LIST_PAGE_SIZE)
+    if not rows:
+        return "📭 Hozircha hech qanday kino mavjud emas.", None
+    lines = [f"🎬 <b>{movie_id}</b> - {title}" for movie_id, title in rows]
+    return list_page("movies", "📋 <b>Kinolar ro'yxati:</b>\n", rows, lines, has_prev, has_next,
+                     backward=before_id is not None)
+
+async def channels_page(after_id: int = 0, before_id: int = None):
+    rows, has_prev, has_next = await db.get_channels_page(after_id, before_id, LIST_PAGE_SIZE)
+    if not rows:
+        return "📭 Hozircha hech qanday kanal mavjud emas.", None
+    lines = [f"📢 {username}\n🔗 {url}\n" for _, username, url in rows]
+    return list_page("channels", "📋 <b>Kanallar ro'yxati:</b>\n", rows, lines, has_prev, has_next,
+                     backward=before_id is not None)
+
+async def turn_list_page(callback: CallbackQuery, page):
+    """⬅️/➡️ bosilganda o'sha xabarning o'zini tahrirlash"""
+    _, direction, cursor = callback.data.split(":")
+    if direction == "next":
+        text, keyboard = await page(after_id=int(cursor))
+    else:
+        text, keyboard = await page(before_id=int(cursor))
+    
+    try:
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Ikki marta tez bosilganda "message is not modified"
+        logging.debug(f"Ro'yxat sahifasini tahrirlab bo'lmadi: {e}")
+    await callback.answer()
 
 # Asosiy menyu
 async def show_main_menu(chat_id: int):
@@ -252,43 +556,28 @@ async def show_main_menu(chat_id: int):
             chat_id, 
             "🎬 <b>Asosiy menyu</b>\n\nKino kodini kiriting:",
             parse_mode="HTML",
-            reply_markup=get_main_menu_keyboard()
+            reply_markup=MAIN_MENU_KEYBOARD
         )
     except Exception as e:
         logging.error(f"Main menu xatosi: {e}")
 
 # Start komandasi
-@dp.message(CommandStart())
+@user_router.message(CommandStart())
 async def start_handler(message: Message):
     user_id = message.from_user.id
     
     try:
         # Foydalanuvchini qo'shish
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT OR REPLACE INTO users (user_id, username, full_name, last_active) 
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (user_id, message.from_user.username, clean_input(message.from_user.full_name)))
-        conn.commit()
-        conn.close()
+        activity_buffer.upsert(user_id, message.from_user.username, clean_input(message.from_user.full_name))
 
     
         # Kanallarni tekshirish
         not_subscribed = await check_user_subscription(user_id)
         
         if not_subscribed:
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for channel in not_subscribed:
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=f"📢 {channel['username']}", url=channel['url'])
-                ])
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription")
-            ])
             await message.answer(
                 "🎬 Xush kelibsiz! Botdan foydalanish uchun kanallarga obuna bo'ling:",
-                reply_markup=keyboard
+                reply_markup=subscription_keyboards.get(not_subscribed)
             )
         else:
             await show_main_menu(user_id)
@@ -297,25 +586,16 @@ async def start_handler(message: Message):
         logging.error(f"Start handler xatosi: {e}")
         await message.answer("Xush kelibsiz! Kino kodini kiriting.")
 
-    # Adminlarga bildirishnoma yuborish
+    # Adminlarga bildirishnoma yig'ma xabarda yuboriladi
+    new_user_digest.add(user_id, message.from_user.username, clean_input(message.from_user.full_name))
 
-    for admin_id in get_admin_ids():
-        try:
-            await bot.send_message(
-                admin_id,
-                f"👤 Yangi foydalanuvchi botga kirdi:\n\n"
-                f"🆔 ID: {user_id}\n"
-                f"👤 Username: @{message.from_user.username if message.from_user.username else 'Yo\'q'}\n"
-                f"📛 F.I.O: {clean_input(message.from_user.full_name)}"
-            )
-        except Exception as e:
-            logging.warning(f"Adminga xabar yuborishda xatolik: {e}")
 # Obunani tekshirish
-@dp.callback_query(F.data == "check_subscription")
+@button(user_callbacks, "check_subscription")
 async def check_subscription(callback: CallbackQuery):
     user_id = callback.from_user.id
     try:
-        not_subscribed = await check_user_subscription(user_id)
+        # Foydalanuvchi o'zi tekshirishni so'radi - keshni chetlab o'tamiz
+        not_subscribed = await check_user_subscription(user_id, force=True)
         
         if not_subscribed:
             await callback.answer("Hali obuna bo'lmagansiz!", show_alert=True)
@@ -326,400 +606,837 @@ async def check_subscription(callback: CallbackQuery):
         await callback.answer("Tekshirildi", show_alert=False)
         await show_main_menu(user_id)
 
-# Admin tekshiruvi
-def admin_required(func):
-    @wraps(func)
-    async def wrapper(message: Message, *args, **kwargs):
-        if message.from_user.id not in get_admin_ids():
-            await message.answer("❌ Siz admin emassiz!")
-            return
-        return await func(message, *args, **kwargs)
-    return wrapper
+# Kanal a'zoligi o'zgarganda keshni darhol yangilash
+@dp.chat_member()
+async def chat_member_handler(event: types.ChatMemberUpdated):
+    subscription_cache.set(
+        event.new_chat_member.user.id,
+        event.chat.id,
+        event.new_chat_member.status not in ['left', 'kicked']
+    )
+
+# Foydalanuvchi botni bloklasa yoki qayta ochsa
+@dp.my_chat_member(F.chat.type == "private")
+async def my_chat_member_handler(event: types.ChatMemberUpdated):
+    try:
+        await db.set_user_active(event.chat.id, event.new_chat_member.status not in ['left', 'kicked'])
+    except Exception as e:
+        logging.error(f"Foydalanuvchi holatini yangilashda xatolik: {e}")
 
 # Admin paneli
-@dp.message(Command("admin"))
-@admin_required
+@admin_router.message(Command("admin"))
 async def admin_command_handler(message: Message):
-    await message.answer("👨‍💻 Admin paneli", reply_markup=get_admin_keyboard())
+    await message.answer("👨‍💻 Admin paneli", reply_markup=ADMIN_KEYBOARD)
 
 # Kino qo'shish
-@dp.message(F.text == "🎬 Kino qo'shish")
-@admin_required
+@button(admin_buttons, "🎬 Kino qo'shish")
 async def add_movie_button(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_movie_title)
-    await message.answer("🎬 Kino nomini kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("🎬 Kino nomini kiriting:", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_movie_title)
+@fsm_router.message(AdminStates.waiting_for_movie_title)
 async def process_movie_title(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
         
     await state.update_data(title=clean_input(message.text))
     await state.set_state(AdminStates.waiting_for_movie_description)
-    await message.answer("📖 Kino tavsifini kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("📖 Kino tavsifini kiriting:", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_movie_description)
+@fsm_router.message(AdminStates.waiting_for_movie_description)
 async def process_movie_description(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
         
     await state.update_data(description=clean_input(message.text))
     await state.set_state(AdminStates.waiting_for_movie_file)
-    await message.answer("🎥 Kino faylini yuboring (video):", reply_markup=get_cancel_keyboard())
+    await message.answer("🎥 Kino faylini yuboring (video):", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_movie_file, F.video)
+@fsm_router.message(AdminStates.waiting_for_movie_file, F.video)
 async def process_movie_file(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
     
     data = await state.get_data()
-    
-    conn = sqlite3.connect('movies.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO movies (title, description, file_id)
-        VALUES (?, ?, ?)
-    ''', (data['title'], data['description'], message.video.file_id))
-    conn.commit()
-    movie_id = cursor.lastrowid
-    conn.close()
+    movie_id = await db.add_movie(data['title'], data['description'], message.video.file_id)
+    if STORAGE_CHANNEL_ID:
+        await store_movie(message, movie_id)
+    movie_cache.invalidate(movie_id)
+    totals_cache.invalidate('totals')
     
     await state.clear()
     await message.answer(
         f"✅ Kino muvaffaqiyatli qo'shildi!\n"
         f"🎬 Kino raqami: {movie_id}",
-        reply_markup=get_admin_keyboard()
+        reply_markup=ADMIN_KEYBOARD
     )
 
+async def store_movie(message: Message, movie_id: int):
+    """Videoni tayyor caption bilan saqlash kanaliga nusxalash"""
+    try:
+        movie = await db.get_movie(movie_id)
+        stored = await bot.copy_message(
+            STORAGE_CHANNEL_ID, message.chat.id, message.message_id, caption=movie[4], parse_mode="HTML"
+        )
+        await db.set_storage_message_id(movie_id, stored.message_id)
+    except Exception as e:
+        logging.error(f"Kinoni saqlash kanaliga nusxalashda xatolik: {e}")
+        await message.answer("⚠️ Saqlash kanaliga nusxalab bo'lmadi, kino file_id orqali yuboriladi.")
+
+# Buzilgan fayllar
+@button(admin_buttons, "⚠️ Buzilgan fayllar")
+async def show_broken_movies(message: Message, state: FSMContext):
+    movies = await db.get_broken_movies()
+    if not movies:
+        await message.answer("✅ Ishlamay qolgan fayllar yo'q.")
+        return
+    
+    lines = ["⚠️ <b>Fayli ishlamay qolgan kinolar:</b>\n"]
+    lines.extend(f"🎬 <b>{movie_id}</b> - {title} ({broken_at[:10]})" for movie_id, title, broken_at in movies)
+    lines.append("\nKinoni o'chirib, faylini qayta yuklang.")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
 # Kino o'chirish
-@dp.message(F.text == "🗑 Kino o'chirish")
-@admin_required
+@button(admin_buttons, "🗑 Kino o'chirish")
 async def delete_movie_button(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_delete_movie)
-    await message.answer("🗑 O'chirish uchun kino raqamini kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("🗑 O'chirish uchun kino raqamini kiriting:", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_delete_movie)
+@fsm_router.message(AdminStates.waiting_for_delete_movie)
 async def process_delete_movie(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
         
     try:
         movie_id = int(message.text.strip())
     except ValueError:
-        await message.answer("❌ Iltimos, faqat raqam kiriting!", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Iltimos, faqat raqam kiriting!", reply_markup=ADMIN_KEYBOARD)
         await state.clear()
         return
 
-    conn = sqlite3.connect('movies.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM movies WHERE id = ?', (movie_id,))
-    movie = cursor.fetchone()
+    movie = await db.delete_movie(movie_id)
+    movie_cache.invalidate(movie_id)
+    totals_cache.invalidate('totals')
 
     if movie:
-        cursor.execute('DELETE FROM movies WHERE id = ?', (movie_id,))
-        conn.commit()
         await message.answer(
             f"✅ Kino muvaffaqiyatli o'chirildi!\n"
             f"🎬 Nomi: {movie[1]}\n"
             f"🔢 Raqami: {movie_id}",
-            reply_markup=get_admin_keyboard()
+            reply_markup=ADMIN_KEYBOARD
         )
     else:
-        await message.answer("❌ Bu raqamli kino topilmadi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Bu raqamli kino topilmadi.", reply_markup=ADMIN_KEYBOARD)
 
-    conn.close()
     await state.clear()
 
-# Kino ro'yxati
-@dp.message(F.text == "📋 Kino ro'yxati")
-@admin_required
-async def show_movies_list(message: Message):
-    movies = get_movies_list()
+# Serial qo'shish
+@button(admin_buttons, "📺 Serial qo'shish")
+async def add_series_button(message: Message, state: FSMContext):
+    await state.set_state(AdminStates.waiting_for_series_title)
+    await message.answer("📺 Serial nomini kiriting:", reply_markup=CANCEL_KEYBOARD)
+
+@fsm_router.message(AdminStates.waiting_for_series_title)
+async def process_series_title(message: Message, state: FSMContext):
+    if message.text == "❌ Bekor qilish":
+        await state.clear()
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
+        return
     
-    if not movies:
-        await message.answer("📭 Hozircha hech qanday kino mavjud emas.")
+    await state.update_data(title=clean_input(message.text))
+    await state.set_state(AdminStates.waiting_for_series_description)
+    await message.answer("📖 Serial tavsifini kiriting:", reply_markup=CANCEL_KEYBOARD)
+
+@fsm_router.message(AdminStates.waiting_for_series_description)
+async def process_series_description(message: Message, state: FSMContext):
+    if message.text == "❌ Bekor qilish":
+        await state.clear()
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
     
-    text = "📋 <b>Kinolar ro'yxati:</b>\n\n"
-    for movie in movies:
-        text += f"🎬 <b>{movie[0]}</b> - {movie[1]}\n"
+    data = await state.get_data()
+    series_id = await db.add_series(data['title'], clean_input(message.text))
+    await state.set_data({'series_id': series_id})
+    await state.set_state(AdminStates.waiting_for_episodes)
+    await message.answer(
+        f"✅ Serial yaratildi! Kodi: S{series_id}\n\n"
+        f"🎥 Endi qismlarni yuboring yoki albom qilib forward qiling. "
+        f"Qismlar kelish tartibida raqamlanadi. Tugatgach \"✅ Tayyor\" ni bosing.",
+        reply_markup=EPISODES_UPLOAD_KEYBOARD
+    )
+
+# Mavjud serialga qism qo'shish
+@button(admin_buttons, "➕ Qism qo'shish")
+async def add_episodes_button(message: Message, state: FSMContext):
+    await state.set_state(AdminStates.waiting_for_series_code)
+    await message.answer("📺 Serial kodini kiriting (masalan: S3):", reply_markup=CANCEL_KEYBOARD)
+
+@fsm_router.message(AdminStates.waiting_for_series_code)
+async def process_series_code(message: Message, state: FSMContext):
+    if message.text == "❌ Bekor qilish":
+        await state.clear()
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
+        return
     
-    if len(text) > 4000:
-        parts = [text[i:i+4000] for i in range(0, len(text), 4000)]
-        for part in parts:
-            await message.answer(part, parse_mode="HTML")
-    else:
-        await message.answer(text, parse_mode="HTML")
+    match = SERIES_CODE_PATTERN.match((message.text or '').strip())
+    series = await db.get_series(int(match.group(1))) if match else None
+    if not series:
+        await state.clear()
+        await message.answer("❌ Bu kodli serial topilmadi.", reply_markup=ADMIN_KEYBOARD)
+        return
+    
+    await state.set_data({'series_id': series[0]})
+    await state.set_state(AdminStates.waiting_for_episodes)
+    await message.answer(
+        f"📺 {series[1]} ({series[3]} ta qism)\n\n🎥 Yangi qismlarni yuboring yoki forward qiling.",
+        reply_markup=EPISODES_UPLOAD_KEYBOARD
+    )
+
+# Albom qismlari alohida update bo'lib keladi - ularni yig'ib, tartib bilan bitta tranzaksiyada yozamiz
+album_buffers = {}
+
+async def save_album(media_group_id: str, series_id: int, chat_id: int):
+    await asyncio.sleep(ALBUM_WAIT)
+    messages = sorted(album_buffers.pop(media_group_id, []), key=lambda m: m.message_id)
+    await save_episodes(series_id, chat_id, [m.video.file_id for m in messages])
+
+async def save_episodes(series_id: int, chat_id: int, file_ids):
+    try:
+        numbers = await db.add_episodes(series_id, file_ids)
+        if len(numbers) == 1:
+            text = f"✅ {numbers[0]}-qism qo'shildi"
+        else:
+            text = f"✅ {len(numbers)} ta qism qo'shildi ({numbers[0]}-{numbers[-1]})"
+        await bot.send_message(chat_id, text)
+    except Exception as e:
+        logging.error(f"Qismlarni saqlashda xatolik: {e}")
+        await bot.send_message(chat_id, "❌ Qismlarni saqlashda xatolik yuz berdi.")
+
+@fsm_router.message(AdminStates.waiting_for_episodes, F.video)
+async def process_episode_video(message: Message, state: FSMContext):
+    series_id = (await state.get_data())['series_id']
+    
+    if message.media_group_id is None:
+        await save_episodes(series_id, message.chat.id, [message.video.file_id])
+        return
+    
+    if message.media_group_id not in album_buffers:
+        album_buffers[message.media_group_id] = []
+        lifecycle.spawn(save_album(message.media_group_id, series_id, message.chat.id), name="save_album")
+    album_buffers[message.media_group_id].append(message)
+
+@fsm_router.message(AdminStates.waiting_for_episodes)
+async def process_episodes_done(message: Message, state: FSMContext):
+    if message.text not in ["✅ Tayyor", "❌ Bekor qilish"]:
+        await message.answer("🎥 Video yuboring yoki \"✅ Tayyor\" ni bosing.")
+        return
+    
+    series_id = (await state.get_data())['series_id']
+    await state.clear()
+    series = await db.get_series(series_id)
+    await message.answer(
+        f"✅ Serial saqlandi!\n📺 {series[1]}\n🔢 Kodi: S{series_id}\n🎞 Qismlar: {series[3]}",
+        reply_markup=ADMIN_KEYBOARD
+    )
+
+# Ommaviy import: CSV/JSONL fayl yoki forward qilingan videolar
+@admin_router.message(Command("import_movies"))
+async def import_movies_handler(message: Message, state: FSMContext):
+    await state.set_state(AdminStates.waiting_for_import)
+    await message.answer(
+        "📥 CSV yoki JSONL fayl yuboring (ustunlar: title, description, file_id; ixtiyoriy id - "
+        "kino kodini saqlash uchun) yoki videolarni forward qiling: caption ning birinchi qatori - nomi, "
+        "qolgani - tavsifi. Tugatgach \"✅ Tayyor\" ni bosing.",
+        reply_markup=EPISODES_UPLOAD_KEYBOARD
+    )
+
+@fsm_router.message(AdminStates.waiting_for_import, F.document)
+async def process_import_document(message: Message, state: FSMContext):
+    fmt = detect_format(message.document.file_name)
+    if fmt is None:
+        await message.answer("❌ Faqat .csv yoki .jsonl fayl qabul qilinadi.")
+        return
+    
+    progress = await message.answer("📥 Import boshlandi...")
+    added = skipped = 0
+    last_update = time.monotonic()
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=f'.{fmt}', delete=False) as file:
+            path = file.name
+        await bot.download(message.document, destination=path)
+        
+        async for rows, invalid in read_movies(path, fmt, IMPORT_CHUNK_SIZE):
+            rows = [
+                (movie_id, clean_input(title), clean_input(description), file_id)
+                for movie_id, title, description, file_id in rows
+            ]
+            count = await db.add_movies(rows) if rows else 0
+            added += count
+            skipped += invalid + len(rows) - count
+            # Har bir bo'lakda emas, bir necha soniyada bir marta
+            if time.monotonic() - last_update >= 3:
+                last_update = time.monotonic()
+                await progress.edit_text(f"📥 Import: {added} ta qo'shildi, {skipped} ta o'tkazib yuborildi...")
+        
+        totals_cache.invalidate('totals')
+        await progress.edit_text(f"✅ Import tugadi: {added} ta qo'shildi, {skipped} ta o'tkazib yuborildi.")
+    except Exception as e:
+        logging.error(f"Import xatosi: {e}")
+        await message.answer(f"❌ Importda xatolik: {added} ta qo'shilgandan keyin to'xtadi.")
+    finally:
+        if path:
+            os.remove(path)
+
+# Forward qilingan videolar chat bo'yicha yig'iladi va IMPORT_CHUNK_SIZE tadan yoziladi
+import_buffers = {}
+
+async def flush_import_buffer(chat_id: int) -> int:
+    rows = import_buffers.pop(chat_id, [])
+    if not rows:
+        return 0
+    added = await db.add_movies(rows)
+    totals_cache.invalidate('totals')
+    return added
+
+@fsm_router.message(AdminStates.waiting_for_import, F.video)
+async def process_import_video(message: Message, state: FSMContext):
+    title, _, description = (message.caption or message.video.file_name or "Kino").strip().partition("\n")
+    import_buffers.setdefault(message.chat.id, []).append(
+        (None, clean_input(title), clean_input(description), message.video.file_id)
+    )
+    if len(import_buffers[message.chat.id]) >= IMPORT_CHUNK_SIZE:
+        added = await flush_import_buffer(message.chat.id)
+        await message.answer(f"📥 {added} ta kino saqlandi")
+
+@fsm_router.message(AdminStates.waiting_for_import)
+async def process_import_done(message: Message, state: FSMContext):
+    if message.text == "❌ Bekor qilish":
+        import_buffers.pop(message.chat.id, None)
+        await state.clear()
+        await message.answer(
+            "❌ Amal bekor qilindi. Saqlanmagan videolar tashlab yuborildi.", reply_markup=ADMIN_KEYBOARD
+        )
+        return
+    if message.text != "✅ Tayyor":
+        await message.answer("📥 Fayl yoki video yuboring, yoki \"✅ Tayyor\" ni bosing.")
+        return
+    
+    added = await flush_import_buffer(message.chat.id)
+    await state.clear()
+    await message.answer(
+        f"✅ Import yakunlandi. Oxirgi to'plamdan {added} ta kino saqlandi.", reply_markup=ADMIN_KEYBOARD
+    )
+
+# Kino ro'yxati
+@button(admin_buttons, "📋 Kino ro'yxati")
+async def show_movies_list(message: Message, state: FSMContext):
+    text, keyboard = await movies_page()
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+@button(admin_callbacks, "movies")
+async def movies_page_callback(callback: CallbackQuery):
+    await turn_list_page(callback, movies_page)
 
 # Statistika
-@dp.message(F.text == "📊 Statistika")
-@admin_required
-async def show_statistics(message: Message):
-    monthly_users = get_monthly_users()
-    total_users = get_total_users()
-    
-    conn = sqlite3.connect('movies.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT COUNT(*) FROM movies')
-    total_movies = cursor.fetchone()[0]
-    conn.close()
+@button(admin_buttons, "📊 Statistika")
+async def show_statistics(message: Message, state: FSMContext):
+    totals = totals_cache.get('totals')
+    if totals is None:
+        totals = (await db.get_total_users(), await db.get_total_movies())
+        totals_cache.set('totals', totals)
+    total_users, total_movies = totals
+    
+    # user_stats kunlari UTC bo'yicha yuritiladi
+    today = datetime.now(timezone.utc).date()
+    daily, weekly, monthly = await db.get_user_stats(
+        today.isoformat(),
+        (today - timedelta(days=6)).isoformat(),
+        today.replace(day=1).isoformat()
+    )
     
     await message.answer(
         f"📊 <b>Bot statistikasi</b>\n\n"
         f"👥 Jami foydalanuvchilar: <b>{total_users}</b>\n"
-        f"📈 Oylik obunachilar: <b>{monthly_users}</b>\n"
-        f"🎬 Jami kinolar: <b>{total_movies}</b>",
+        f"📅 Bugun: <b>+{daily[0]}</b> / -{daily[1]}\n"
+        f"🗓 Oxirgi 7 kun: <b>+{weekly[0]}</b> / -{weekly[1]}\n"
+        f"📈 Oylik obunachilar: <b>+{monthly[0]}</b> / -{monthly[1]}\n"
+        f"🎬 Jami kinolar: <b>{total_movies}</b>\n\n"
+        f"⚡️ Obuna keshi: {subscription_cache.hits} hit / {subscription_cache.misses} miss "
+        f"({subscription_cache.hit_rate:.0%})\n"
+        f"📝 Faollik buferi: {activity_buffer.written} yozildi, {activity_buffer.coalesced} birlashtirildi\n"
+        f"🎞 Kino keshi: {movie_cache.size} ta, hit {movie_cache.hit_rate:.0%}\n"
+        f"🚦 API limiti: {rate_limiter.throttled} kutdi, {rate_limiter.retried} qayta, "
+        f"{rate_limiter.dropped} tashlandi\n"
+        f"🔔 Bildirishnomalar: {new_user_digest.received} ta /start, {new_user_digest.skipped} takroriy, "
+        f"{new_user_digest.sent} xabar\n"
+        f"🛡 Flood himoyasi: {throttling.dropped} ta tashlandi\n"
+        f"🩺 Fayllar: {file_verifier.checked} ta tekshirildi, {file_verifier.broken} ta buzilgan",
         parse_mode="HTML"
     )
 
 # Kanallar boshqaruvi
-@dp.message(F.text == "📢 Kanallar boshqaruvi")
-@admin_required
-async def channels_management_button(message: Message):
-    await message.answer("📢 Kanallar boshqaruvi", reply_markup=get_channels_keyboard())
+@button(admin_buttons, "📢 Kanallar boshqaruvi")
+async def channels_management_button(message: Message, state: FSMContext):
+    await message.answer("📢 Kanallar boshqaruvi", reply_markup=CHANNELS_KEYBOARD)
 
 # Kanal qo'shish
-@dp.message(F.text == "➕ Kanal qo'shish")
-@admin_required
+@button(admin_buttons, "➕ Kanal qo'shish")
 async def add_channel_button(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_channel_username)
-    await message.answer("📢 Kanal username ni kiriting (masalan: @kanal_nomi):", reply_markup=get_cancel_keyboard())
+    await message.answer("📢 Kanal username ni kiriting (masalan: @kanal_nomi):", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_channel_username)
+@fsm_router.message(AdminStates.waiting_for_channel_username)
 async def process_channel_username(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_channels_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=CHANNELS_KEYBOARD)
         return
         
     username = clean_input(message.text)
     
-    is_admin = await is_bot_admin_in_channel(username)
+    chat_id = await resolve_channel(username)
+    is_admin = chat_id is not None and await is_bot_admin_in_channel(chat_id)
     if not is_admin:
         await message.answer("❌ Bot bu kanalda admin emas! Iltimos, avval botni kanalga admin qiling.")
         await state.clear()
         return
         
-    await state.update_data(username=username)
+    await state.update_data(username=username, chat_id=chat_id)
     await state.set_state(AdminStates.waiting_for_channel_url)
-    await message.answer("🔗 Kanal linkini kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("🔗 Kanal linkini kiriting:", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_channel_url)
+@fsm_router.message(AdminStates.waiting_for_channel_url)
 async def process_channel_url(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_channels_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=CHANNELS_KEYBOARD)
         return
         
     data = await state.get_data()
-    
-    conn = sqlite3.connect('movies.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT OR REPLACE INTO channels (username, url)
-        VALUES (?, ?)
-    ''', (data['username'], clean_input(message.text)))
-    conn.commit()
-    conn.close()
+    await db.add_channel(data['username'], clean_input(message.text), data['chat_id'])
+    subscription_keyboards.invalidate()
     
     await state.clear()
     await message.answer(
         f"✅ Kanal muvaffaqiyatli qo'shildi!\n"
         f"📢 Username: {data['username']}",
-        reply_markup=get_channels_keyboard()
+        reply_markup=CHANNELS_KEYBOARD
     )
 
 # Kanal o'chirish
-@dp.message(F.text == "🗑 Kanal o'chirish")
-@admin_required
+@button(admin_buttons, "🗑 Kanal o'chirish")
 async def delete_channel_button(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_delete_channel)
-    await message.answer("🗑 O'chirish uchun kanal username ni kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("🗑 O'chirish uchun kanal username ni kiriting:", reply_markup=CANCEL_KEYBOARD)
 
-@dp.message(AdminStates.waiting_for_delete_channel)
+@fsm_router.message(AdminStates.waiting_for_delete_channel)
 async def process_delete_channel(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_channels_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=CHANNELS_KEYBOARD)
         return
         
     username = clean_input(message.text.strip())
     
-    conn = sqlite3.connect('movies.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM channels WHERE username = ?', (username,))
-    channel = cursor.fetchone()
+    channel = await db.delete_channel(username)
 
     if channel:
-        cursor.execute('DELETE FROM channels WHERE username = ?', (username,))
-        conn.commit()
+        subscription_cache.invalidate_channel(channel[0])
+        subscription_keyboards.invalidate()
+        channel_resolve_retry.pop(username, None)
         await message.answer(
             f"✅ Kanal muvaffaqiyatli o'chirildi!\n"
             f"📢 Username: {username}",
-            reply_markup=get_channels_keyboard()
+            reply_markup=CHANNELS_KEYBOARD
         )
     else:
-        await message.answer("❌ Bu username li kanal topilmadi.", reply_markup=get_channels_keyboard())
+        await message.answer("❌ Bu username li kanal topilmadi.", reply_markup=CHANNELS_KEYBOARD)
 
-    conn.close()
     await state.clear()
 
 # Kanallar ro'yxati
-@dp.message(F.text == "📋 Kanallar ro'yxati")
-@admin_required
-async def show_channels_list(message: Message):
-    channels = get_channels()
-    
-    if not channels:
-        await message.answer("📭 Hozircha hech qanday kanal mavjud emas.")
-        return
-    
-    text = "📋 <b>Kanallar ro'yxati:</b>\n\n"
-    for channel in channels:
-        text += f"📢 {channel['username']}\n"
-        text += f"🔗 {channel['url']}\n\n"
-    
-    await message.answer(text, parse_mode="HTML")
+@button(admin_buttons, "📋 Kanallar ro'yxati")
+async def show_channels_list(message: Message, state: FSMContext):
+    text, keyboard = await channels_page()
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+@button(admin_callbacks, "channels")
+async def channels_page_callback(callback: CallbackQuery):
+    await turn_list_page(callback, channels_page)
 
 # Barchaga xabar yuborish
-@dp.message(F.text == "📨 Barchaga xabar yuborish")
-@admin_required
+@button(admin_buttons, "📨 Barchaga xabar yuborish")
 async def broadcast_message_button(message: Message, state: FSMContext):
     await state.set_state(AdminStates.waiting_for_broadcast)
-    await message.answer("📨 Barcha foydalanuvchilarga yuboriladigan xabarni kiriting:", reply_markup=get_cancel_keyboard())
+    await message.answer("📨 Barcha foydalanuvchilarga yuboriladigan xabarni kiriting:", reply_markup=CANCEL_KEYBOARD)
+
+# Faqat faol foydalanuvchilarga xabar yuborish: /broadcast [oxirgi N kunda faol bo'lganlar]
+@admin_router.message(Command("broadcast"))
+async def broadcast_command_handler(message: Message, command: CommandObject, state: FSMContext):
+    days = command.args.strip() if command.args else ''
+    if not days.isdigit():
+        await broadcast_message_button(message, state)
+        return
+
+    await state.set_state(AdminStates.waiting_for_broadcast)
+    await state.update_data(active_since=utc_timestamp(days_ago=int(days)))
+    await message.answer(
+        f"📨 Oxirgi {days} kunda faol bo'lgan foydalanuvchilarga yuboriladigan xabarni kiriting:",
+        reply_markup=CANCEL_KEYBOARD
+    )
 
-@dp.message(AdminStates.waiting_for_broadcast)
+@fsm_router.message(AdminStates.waiting_for_broadcast)
 async def process_broadcast_message(message: Message, state: FSMContext):
     if message.text == "❌ Bekor qilish":
         await state.clear()
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
         return
         
-    users = get_all_users()
-    success_count = 0
-    fail_count = 0
+    # Yuborish fonda davom etadi, holat xabari vaqti-vaqti bilan yangilanadi
+    data = await state.get_data()
+    await state.clear()
+    await broadcast_engine.start(message.chat.id, message.message_id, message.chat.id, data.get('active_since'))
+    await message.answer("📨 Xabar yuborish fonda boshlandi.", reply_markup=ADMIN_KEYBOARD)
+
+# Foydalanuvchilarni CSV ga eksport qilish: /export_users [oxirgi N kunda faol bo'lganlar]
+@admin_router.message(Command("export_users"))
+async def export_users_handler(message: Message, command: CommandObject):
+    days = command.args.strip() if command.args else ''
+    active_since = utc_timestamp(days_ago=int(days)) if days.isdigit() else None
     
-    await message.answer(f"📨 Xabar {len(users)} ta foydalanuvchiga yuborilmoqda...")
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as file:
+            path = file.name
+            writer = csv.writer(file)
+            writer.writerow(['user_id', 'username', 'full_name', 'joined_date', 'last_active'])
+            async for rows in db.iter_users(active_since=active_since, full=True):
+                await asyncio.to_thread(writer.writerows, rows)
+        
+        await message.answer_document(FSInputFile(path, filename='users.csv'))
+    except Exception as e:
+        logging.error(f"Eksport xatosi: {e}")
+        await message.answer("❌ Eksport qilishda xatolik yuz berdi.")
+    finally:
+        if path:
+            os.remove(path)
+
+# Kinolarni eksport qilish: /export_movies [csv|jsonl]
+@admin_router.message(Command("export_movies"))
+async def export_movies_handler(message: Message, command: CommandObject):
+    fmt = command.args.strip().lower() if command.args else 'csv'
+    if fmt not in FORMATS:
+        await message.answer("❌ Format: csv yoki jsonl")
+        return
     
-    for user_id in users:
-        try:
-            await bot.send_message(user_id, f"📢 {clean_input(message.text)}")
-            success_count += 1
-            await asyncio.sleep(0.1)
-        except Exception as e:
-            fail_count += 1
+    path = None
+    try:
+        with tempfile.NamedTemporaryFile('w', suffix=f'.{fmt}', newline='', encoding='utf-8', delete=False) as file:
+            path = file.name
+            writer = MovieWriter(file, fmt)
+            async for rows in db.iter_movies():
+                # Bazada HTML-escape qilingan holda saqlanadi; import qayta escape qiladi
+                rows = [
+                    (movie_id, html.unescape(title), html.unescape(description or ''), file_id)
+                    for movie_id, title, description, file_id in rows
+                ]
+                await asyncio.to_thread(writer.write, rows)
+        
+        await message.answer_document(FSInputFile(path, filename=f'movies.{fmt}'))
+    except Exception as e:
+        logging.error(f"Eksport xatosi: {e}")
+        await message.answer("❌ Eksport qilishda xatolik yuz berdi.")
+    finally:
+        if path:
+            os.remove(path)
+
+# Adminlar ro'yxati
+@admin_router.message(Command("admins"))
+async def admins_list_handler(message: Message):
+    admins = {row[0]: row for row in await db.get_admins()}
+    text = "👨‍💻 <b>Adminlar:</b>\n\n"
+    for user_id in sorted(admin_ids):
+        _, username, full_name, _ = admins.get(user_id, (user_id, None, None, None))
+        owner = " (bosh admin)" if user_id in ADMIN_IDS else ""
+        text += f"🆔 <code>{user_id}</code> {html.escape(full_name or '')} {'@' + username if username else ''}{owner}\n"
+    text += "\n➕ /add_admin &lt;user_id&gt;\n➖ /remove_admin &lt;user_id&gt;"
+    await message.answer(text, parse_mode="HTML")
+
+# Admin qo'shish: /add_admin <user_id>
+@admin_router.message(Command("add_admin"))
+async def add_admin_handler(message: Message, command: CommandObject):
+    args = command.args.strip() if command.args else ''
+    if not args.isdigit():
+        await message.answer("ℹ️ Foydalanish: /add_admin <user_id>")
+        return
     
-    await state.clear()
-    await message.answer(
-        f"✅ Xabar yuborish yakunlandi!\n\n"
-        f"✅ Muvaffaqiyatli: {success_count}\n"
-        f"❌ Xatolik: {fail_count}",
-        reply_markup=get_admin_keyboard()
-    )
+    user_id = int(args)
+    added = await db.add_admin(user_id, message.from_user.id)
+    # Baza yozuvi muvaffaqiyatli bo'lgandan keyin - await siz - to'plam yangilanadi
+    admin_ids.add(user_id)
+    if added:
+        await message.answer(f"✅ {user_id} admin qilindi.")
+    else:
+        await message.answer(f"ℹ️ {user_id} allaqachon admin.")
+
+# Adminni o'chirish: /remove_admin <user_id>
+@admin_router.message(Command("remove_admin"))
+async def remove_admin_handler(message: Message, command: CommandObject):
+    args = command.args.strip() if command.args else ''
+    if not args.isdigit():
+        await message.answer("ℹ️ Foydalanish: /remove_admin <user_id>")
+        return
+    
+    user_id = int(args)
+    if user_id in ADMIN_IDS:
+        await message.answer("❌ Bosh adminni o'chirib bo'lmaydi.")
+        return
+    
+    removed = await db.remove_admin(user_id)
+    admin_ids.discard(user_id)
+    if removed:
+        await message.answer(f"✅ {user_id} adminlar ro'yxatidan o'chirildi.")
+    else:
+        await message.answer(f"❌ {user_id} admin emas.")
 
 # Kino kodini kiritish tugmasini qayta ishlash
-@dp.message(F.text == "📝 Kino kodini kiritish")
-async def request_movie_code(message: Message):
+@button(user_buttons, "📝 Kino kodini kiritish")
+async def request_movie_code(message: Message, state: FSMContext):
     await message.answer("🎬 Iltimos, kino raqamini kiriting:")
 
 # Kino raqamini qabul qilish
-@dp.message(F.text & ~F.command)
+@user_router.message(TextFilter())
 async def handle_movie_number(message: Message):
     user_id = message.from_user.id
     text = message.text.strip()
     
-    admin_buttons = [
-        "🎬 Kino qo'shish", "🗑 Kino o'chirish", "📊 Statistika", "📢 Kanallar boshqaruvi",
-        "📨 Barchaga xabar yuborish", "📋 Kino ro'yxati", "🔙 Asosiy menyu",
-        "➕ Kanal qo'shish", "🗑 Kanal o'chirish", "📋 Kanallar ro'yxati", "🔙 Orqaga",
-        "❌ Bekor qilish", "📝 Kino kodini kiritish"
-    ]
-    
-    if text in admin_buttons:
+    if text in MENU_BUTTONS:
         return
     
-    if not text.isdigit():
-        await message.answer("❌ Iltimos, faqat raqam kiriting!")
-        return
-    
-    content_id = int(text)
-    
     try:
         # Foydalanuvchi faolligini yangilash
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('UPDATE users SET last_active = CURRENT_TIMESTAMP WHERE user_id = ?', (user_id,))
-        conn.commit()
-        conn.close()
+        activity_buffer.touch(user_id)
+        
+        series_match = SERIES_CODE_PATTERN.match(text)
+        
+        # Raqam yoki serial kodi bo'lmasa nom bo'yicha qidiramiz
+        if not text.isdigit() and not series_match:
+            await send_search_results(message, text)
+            return
         
         # Kanallarga obuna tekshirish
         not_subscribed = await check_user_subscription(user_id)
         
         if not_subscribed:
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-            for channel in not_subscribed:
-                keyboard.inline_keyboard.append([
-                    InlineKeyboardButton(text=f"📢 {channel['username']}", url=channel['url'])
-                ])
-            keyboard.inline_keyboard.append([
-                InlineKeyboardButton(text="✅ Tekshirish", callback_data="check_subscription")
-            ])
-            await message.answer("❌ Iltimos, avval barcha kanallarga obuna bo'ling!", reply_markup=keyboard)
+            await message.answer(
+                "❌ Iltimos, avval barcha kanallarga obuna bo'ling!",
+                reply_markup=subscription_keyboards.get(not_subscribed)
+            )
             return
         
-        # Kino qidirish
-        conn = sqlite3.connect('movies.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM movies WHERE id = ?', (content_id,))
-        movie = cursor.fetchone()
-        conn.close()
-
-        if movie:
-            await bot.send_video(
-                chat_id=user_id,
-                video=movie[3],
-                caption=f"🎬 {movie[1]}\n\n{movie[2]}\n\n🔢 Kino raqami: {movie[0]}"
-            )
+        if series_match:
+            await show_series(message, int(series_match.group(1)))
             return
         
-        await message.answer("❌ Noto'g'ri raqam! Bu raqamli kino mavjud emas.")
+        # Kino qidirish
+        if not await send_movie(user_id, int(text)):
+            await message.answer("❌ Noto'g'ri raqam! Bu raqamli kino mavjud emas.")
         
     except Exception as e:
         logging.error(f"Movie search xatosi: {e}")
         await message.answer("❌ Xatolik yuz berdi. Qaytadan urinib ko'ring.")
 
+# Serial kodi: S12 (kino kodlaridan farqlash uchun)
+SERIES_CODE_PATTERN = re.compile(r'^[sS](\d+)$')
+
+async def show_series(message: Message, series_id: int):
+    series = await db.get_series(series_id)
+    if not series or not series[3]:
+        await message.answer("❌ Bu kodli serial mavjud emas.")
+        return
+    
+    numbers = await db.get_episode_numbers(series_id, EPISODES_PAGE_SIZE)
+    await message.answer(
+        f"📺 <b>{series[1]}</b>\n\n{series[2] or ''}\n\n🎞 Qismlar soni: {series[3]}",
+        parse_mode="HTML",
+        reply_markup=get_episodes_keyboard(series_id, numbers, 0, series[3])
+    )
+
+async def ensure_subscribed(callback: CallbackQuery) -> bool:
+    """Callback orqali kontent so'ralganda obunani tekshirish"""
+    not_subscribed = await check_user_subscription(callback.from_user.id)
+    if not_subscribed:
+        await callback.answer()
+        await callback.message.answer(
+            "❌ Iltimos, avval barcha kanallarga obuna bo'ling!",
+            reply_markup=subscription_keyboards.get(not_subscribed)
+        )
+        return False
+    return True
+
+# Qismlar sahifasini almashtirish
+@button(user_callbacks, "eps")
+async def episodes_page_callback(callback: CallbackQuery):
+    _, series_id, page = callback.data.split(":")
+    series_id, page = int(series_id), int(page)
+    
+    series = await db.get_series(series_id)
+    if not series:
+        await callback.answer("Serial topilmadi", show_alert=True)
+        return
+    
+    numbers = await db.get_episode_numbers(series_id, EPISODES_PAGE_SIZE, page * EPISODES_PAGE_SIZE)
+    await callback.message.edit_reply_markup(
+        reply_markup=get_episodes_keyboard(series_id, numbers, page, series[3])
+    )
+    await callback.answer()
+
+# Bitta qismni yuborish
+@button(user_callbacks, "ep")
+async def episode_callback(callback: CallbackQuery):
+    if not await ensure_subscribed(callback):
+        return
+    
+    _, series_id, number = callback.data.split(":")
+    series = await db.get_series(int(series_id))
+    file_id = await db.get_episode(int(series_id), int(number))
+    await callback.answer()
+    if not series or not file_id:
+        await callback.message.answer("❌ Bu qism topilmadi.")
+        return
+    
+    await bot.send_video(
+        callback.from_user.id, video=file_id, caption=f"📺 {series[1]}\n🎞 {number}-qism", parse_mode="HTML"
+    )
+
+# Barcha qismlarni 10 talik albomlar bilan yuborish
+@button(user_callbacks, "epall")
+async def all_episodes_callback(callback: CallbackQuery):
+    if not await ensure_subscribed(callback):
+        return
+    
+    series_id = int(callback.data.split(":")[1])
+    series = await db.get_series(series_id)
+    episodes = await db.get_episodes(series_id)
+    await callback.answer()
+    if not series or not episodes:
+        await callback.message.answer("❌ Bu serialda qismlar yo'q.")
+        return
+    
+    # send_media_group bitta so'rovda 10 tagacha video yuboradi
+    for start in range(0, len(episodes), 10):
+        await bot.send_media_group(callback.from_user.id, media=[
+            InputMediaVideo(media=file_id, caption=f"📺 {series[1]}\n🎞 {number}-qism", parse_mode="HTML")
+            for number, file_id in episodes[start:start + 10]
+        ])
+
+async def send_search_results(message: Message, query: str):
+    movies = await db.search_movies(query, limit=SEARCH_RESULTS_LIMIT)
+    if not movies:
+        await message.answer("❌ Hech narsa topilmadi. Kino raqamini yoki nomini kiriting.")
+        return
+    
+    keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        # Tugma matni HTML emas - bazadagi escape qilingan nom qaytariladi
+        [InlineKeyboardButton(text=f"🎬 {movie[0]}. {html.unescape(movie[1])}", callback_data=f"movie:{movie[0]}")]
+        for movie in movies
+    ])
+    await message.answer(
+        f"🔎 <b>{clean_input(query)}</b> bo'yicha topilgan kinolar:",
+        parse_mode="HTML",
+        reply_markup=keyboard
+    )
+
+# Qidiruv natijasidan kinoni tanlash
+@button(user_callbacks, "movie")
+async def movie_callback(callback: CallbackQuery):
+    user_id = callback.from_user.id
+    movie_id = int(callback.data.split(":")[1])
+    
+    not_subscribed = await check_user_subscription(user_id)
+    if not_subscribed:
+        await callback.answer()
+        await callback.message.answer(
+            "❌ Iltimos, avval barcha kanallarga obuna bo'ling!",
+            reply_markup=subscription_keyboards.get(not_subscribed)
+        )
+        return
+    
+    await callback.answer()
+    if not await send_movie(user_id, movie_id):
+        await callback.message.answer("❌ Bu kino o'chirilgan.")
+
+# Inline rejim: @bot <nomi yoki raqami>
+@user_router.inline_query()
+async def inline_search_handler(inline_query: InlineQuery):
+    query = inline_query.query.strip()
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+    
+    not_subscribed = await check_user_subscription(inline_query.from_user.id)
+    if not_subscribed:
+        await inline_query.answer(
+            [],
+            cache_time=30,
+            is_personal=True,
+            button=InlineQueryResultsButton(text="📢 Avval kanallarga obuna bo'ling", start_parameter="subscribe")
+        )
+        return
+    
+    if query.isdigit():
+        movie = await get_movie(int(query)) if offset == 0 else None
+        movies = [movie] if movie else []
+    elif query:
+        movies = await db.search_movies(query, limit=INLINE_PAGE_SIZE, offset=offset)
+    else:
+        movies = []
+    
+    results = [
+        InlineQueryResultCachedVideo(
+            id=str(movie[0]),
+            video_file_id=movie[3],
+            title=f"{movie[0]}. {html.unescape(movie[1])}",
+            description=html.unescape(movie[2] or '')[:100],
+            caption=movie[4],
+            parse_mode="HTML"
+        )
+        for movie in movies
+    ]
+    # Sahifa to'lgan bo'lsa keyingisi bo'lishi mumkin
+    next_offset = str(offset + len(movies)) if len(movies) == INLINE_PAGE_SIZE else ''
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True, next_offset=next_offset)
+
 # Bekor qilish
-@dp.message(F.text == "❌ Bekor qilish")
+@button(user_buttons, "❌ Bekor qilish")
 async def cancel_handler(message: Message, state: FSMContext):
     current_state = await state.get_state()
     if current_state is not None:
         await state.clear()
     
-    if message.from_user.id in get_admin_ids():
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_admin_keyboard())
+    if message.from_user.id in admin_ids:
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=ADMIN_KEYBOARD)
     else:
-        await message.answer("❌ Amal bekor qilindi.", reply_markup=get_main_menu_keyboard())
+        await message.answer("❌ Amal bekor qilindi.", reply_markup=MAIN_MENU_KEYBOARD)
 
 # Orqaga tugmasi
-@dp.message(F.text == "🔙 Orqaga")
+@button(admin_buttons, "🔙 Orqaga")
 async def back_handler(message: Message, state: FSMContext):
     current_state = await state.get_state()
     if current_state is not None:
         await state.clear()
     
-    if message.from_user.id in get_admin_ids():
-        await message.answer("👨‍💻 Admin paneli", reply_markup=get_admin_keyboard())
+    await message.answer("👨‍💻 Admin paneli", reply_markup=ADMIN_KEYBOARD)
 
 # Asosiy menyuga qaytish
-@dp.message(F.text == "🔙 Asosiy menyu")
+@button(user_buttons, "🔙 Asosiy menyu")
 async def back_to_main_handler(message: Message, state: FSMContext):
     current_state = await state.get_state()
     if current_state is not None:
@@ -739,18 +1456,169 @@ async def global_error_handler(event: types.ErrorEvent):
         pass
 
 # Botni ishga tushirish
-async def main():
+def use_webhook() -> bool:
+    if BOT_MODE != 'webhook':
+        return False
+    if not WEBHOOK_URL:
+        logging.warning("WEBHOOK_URL berilmagan, polling rejimiga o'tildi")
+        return False
+    if not WEBHOOK_SECRET:
+        raise RuntimeError("Webhook rejimi uchun WEBHOOK_SECRET berilishi shart")
+    return True
+
+polling_task = None
+maintenance_task = None
+cache_sync_task = None
+
+async def maintenance_loop():
+    """Eskirgan FSM holatlari va update_id yozuvlarini vaqti-vaqti bilan tozalash"""
+    while True:
+        try:
+            if isinstance(fsm_storage, SQLiteStorage):
+                await fsm_storage.cleanup()
+            await db.cleanup_processed_updates()
+        except Exception as e:
+            logging.error(f"Tozalashda xatolik: {e}")
+        await asyncio.sleep(3600)
+
+async def cache_sync_loop(versions: dict):
+    """Boshqa replika yoki workerda o'zgargan adminlar va kinolarni keshlarga yetkazish
+
+    cache_versions dagi ikkita qator o'qiladi; versiya o'zgargan bo'lsa adminlar
+    qayta yuklanadi yoki kino keshi tozalanadi. O'chirilgan admin ko'pi bilan
+    CACHE_SYNC_INTERVAL soniyadan keyin hamma jarayonda huquqini yo'qotadi.
+    """
+    while True:
+        await asyncio.sleep(CACHE_SYNC_INTERVAL)
+        try:
+            current = await db.get_cache_versions()
+            if current.get('admins') != versions.get('admins'):
+                await load_admins()
+            if current.get('movies') != versions.get('movies'):
+                movie_cache.clear()
+            versions = current
+        except Exception as e:
+            logging.error(f"Keshlarni sinxronlashda xatolik: {e}")
+
+async def warm_up():
+    """Kino keshi va kanal ID larini oldindan yuklash"""
+    results = await asyncio.gather(warm_up_movie_cache(), get_resolved_channels(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logging.error(f"Isitishda xatolik: {result}")
+
+async def on_startup():
+    global polling_task, maintenance_task, cache_sync_task
     logging.info("Bot ishga tushmoqda...")
+    # Sozlamalar xato bo'lsa hech narsa ishga tushmasdan to'xtaymiz
+    webhook = use_webhook()
     
+    await db.connect()
+    # Versiyalar keshlar yuklanishidan oldin o'qiladi - oradagi o'zgarish o'tkazib yuborilmaydi
+    cache_versions = await db.get_cache_versions()
+    await load_admins()
+    activity_buffer.start()
+    new_user_digest.start()
+    file_verifier.start()
+    maintenance_task = asyncio.create_task(maintenance_loop())
+    if CACHE_SYNC_INTERVAL > 0:
+        cache_sync_task = asyncio.create_task(cache_sync_loop(cache_versions))
+    await broadcast_engine.resume()
+    bot_info = await bot.get_me()
+    # Keshlar updatelar qabul qilish bilan parallel isitiladi
+    lifecycle.spawn(warm_up(), name="warm_up")
+    
+    if webhook:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types(),
+            drop_pending_updates=DROP_PENDING_UPDATES
+        )
+        logging.info(f"Bot ishga tushdi (webhook): @{bot_info.username}")
+    else:
+        await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+        polling_task = asyncio.create_task(
+            dp.start_polling(bot, handle_signals=False, close_bot_session=False)
+        )
+        logging.info(f"Bot ishga tushdi (polling): @{bot_info.username}")
+
+async def on_shutdown():
+    # Yangi updatelar qabul qilinmaydi: polling to'xtaydi, webhook 503 qaytaradi
+    lifecycle.close()
     try:
-        bot_info = await bot.get_me()
-        logging.info(f"Bot ishga tushdi: @{bot_info.username}")
-        await dp.start_polling(bot, skip_updates=True)
-        
+        if polling_task is not None:
+            await dp.stop_polling()
+            await polling_task
+        elif WEBHOOK_DELETE_ON_SHUTDOWN:
+            await bot.delete_webhook()
     except Exception as e:
-        logging.error(f"Bot ishga tushirishda xatolik: {e}")
+        logging.error(f"Botni to'xtatishda xatolik: {e}")
     finally:
+        if maintenance_task is not None:
+            maintenance_task.cancel()
+        if cache_sync_task is not None:
+            cache_sync_task.cancel()
+        # Boshlangan handlerlar, albomlar va ommaviy xabarlar bitta muddat ichida tugatiladi;
+        # ommaviy xabar joyi saqlanadi va keyingi ishga tushishda davom ettiriladi
+        await asyncio.gather(
+            lifecycle.drain(SHUTDOWN_TIMEOUT),
+            broadcast_engine.stop(timeout=SHUTDOWN_TIMEOUT)
+        )
+        # Buferlar handlerlardan keyin: ular yozgan oxirgi yozuvlar ham saqlanadi
+        await activity_buffer.stop()
+        await file_verifier.stop()
+        await new_user_digest.stop()
         await bot.session.close()
+        await db.close()
+        logging.info("Bot to'xtatildi")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await on_startup()
+    yield
+    await on_shutdown()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get("/")
+async def root():
+    if not lifecycle.accepting:
+        return Response(status_code=503)
+    return {"status": "Bot ishga tayyor"}
+
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    if METRICS_TOKEN and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+    ):
+        return Response(status_code=401)
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post(WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    if polling_task is not None:
+        return Response(status_code=404)
+    if not lifecycle.accepting:
+        # Telegram updateni keyinroq qayta yuboradi (yangi replikaga)
+        return Response(status_code=503)
+    # Baytlar solishtiriladi: ASCII bo'lmagan sarlavha TypeError (500) emas, 403 beradi
+    token = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+    if not WEBHOOK_SECRET or not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+        return Response(status_code=403)
+    
+    update = types.Update.model_validate(await request.json(), context={"bot": bot})
+    
+    # Telegram javobni kutib turmasligi uchun update fonda qayta ishlanadi
+    lifecycle.spawn(dp.feed_update(bot, update), name="webhook_update")
+    return {"ok": True}
+
+async def main():
+    # uvicorn SIGINT/SIGTERM ni o'zi ushlaydi va lifespan orqali on_shutdown ni chaqiradi
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="0.0.0.0", port=PORT, timeout_graceful_shutdown=int(SHUTDOWN_TIMEOUT)
+    ))
+    await server.serve()
 
 if __name__ == "__main__":
     try:
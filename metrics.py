@@ -0,0 +1,249 @@
+import functools
+import inspect
+import time
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+
+# Soniyalarda: Telegram API va handlerlar uchun mos oraliqlar
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    """Bitta label bo'yicha hisoblagich
+
+    Hammasi event loop ichida o'zgaradi, shuning uchun qulf kerak emas.
+    """
+
+    def __init__(self, name: str, documentation: str, label: str):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self._values = {}
+
+    def inc(self, label_value: str, amount: float = 1):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for label_value, value in self._values.items():
+            yield f'{self.name}{{{self.label}="{label_value}"}} {value}'
+
+
+class Histogram:
+    """Bitta label bo'yicha gistogramma
+
+    Har bir label uchun bir marta ro'yxat yaratiladi; `observe` faqat
+    bisect va ikkita qo'shishdan iborat. Kumulyativ qiymatlar eksportda hisoblanadi.
+    """
+
+    def __init__(self, name: str, documentation: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label -> [bucket_1, ..., bucket_n, +Inf, sum]
+        self._series = {}
+
+    def observe(self, label_value: str, value: float):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for label_value, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {cumulative}'
+            cumulative += series[-2]
+            yield f'{self.name}_bucket{{{self.label}="{label_value}",le="+Inf"}} {cumulative}'
+            yield f'{self.name}_sum{{{self.label}="{label_value}"}} {series[-1]}'
+            yield f'{self.name}_count{{{self.label}="{label_value}"}} {cumulative}'
+
+
+class Gauge:
+    """Qiymati eksport paytida funksiyadan olinadigan ko'rsatkich (kesh hajmi va h.k.)"""
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.func = func
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {self.func()}"
+
+
+class FuncCounter(Gauge):
+    """Qiymati eksport paytida funksiyadan olinadigan, faqat o'sadigan hisoblagich
+
+    Obyekt o'zida saqlaydigan sonlar (tashlangan so'rovlar va h.k.) uchun; nomi `_total` bilan tugaydi.
+    """
+
+    def render(self):
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        yield f"{self.name} {self.func()}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, label: str) -> Counter:
+        return self.register(Counter(name, documentation, label))
+
+    def histogram(self, name: str, documentation: str, label: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, label, buckets))
+
+    def gauge(self, name: str, documentation: str, func: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, func))
+
+    def func_counter(self, name: str, documentation: str, func: Callable[[], float]) -> FuncCounter:
+        return self.register(FuncCounter(name, documentation, func))
+
+    def render(self) -> str:
+        """Prometheus text exposition formati"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.append('')
+        return "\n".join(lines)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Tashqi (outer) middleware: update turlari soni va to'liq qayta ishlash vaqti"""
+
+    def __init__(self, updates: Counter, latency: Histogram):
+        self.updates = updates
+        self.latency = latency
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        event_type = event.event_type
+        self.updates.inc(event_type)
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.latency.observe(event_type, time.perf_counter() - start)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Ichki middleware: har bir handler bo'yicha vaqt
+
+    Tugmalar dict orqali topilganda (button_handler) tugma funksiyasi nomi ishlatiladi.
+    """
+
+    def __init__(self, latency: Histogram, errors: Counter):
+        self.latency = latency
+        self.errors = errors
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = data.get('button_handler') or data['handler'].callback
+        name = callback.__name__
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors.inc(name)
+            raise
+        finally:
+            self.latency.observe(name, time.perf_counter() - start)
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Bot sessiyasi: har bir API metodi javob vaqti va xatolari"""
+
+    def __init__(self, latency: Histogram, errors: Counter):
+        self.latency = latency
+        self.errors = errors
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        name = method.__api_method__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            self.errors.inc(name)
+            raise
+        finally:
+            self.latency.observe(name, time.perf_counter() - start)
+
+
+def instrument(obj, latency: Histogram, exclude=(), prefix: str = ''):
+    """Obyektning barcha ochiq async metodlarini vaqt o'lchaydigan o'ram bilan almashtirish
+
+    O'ramlar bir marta, ishga tushishda yaratiladi; chaqiruv paytida qo'shimcha obyekt yaratilmaydi.
+    `exclude` - o'lchanmaydigan metodlar: boshqa metodlar ichida chaqiriladigan quyi
+    darajadagilar bo'lsa, bitta so'rov ikki xil label bilan ikki marta sanalmaydi.
+    Label - `prefix` + metod nomi. Async generatorlarda har bir bo'lakni olish alohida o'lchanadi.
+    """
+    for name, method in inspect.getmembers(obj, inspect.iscoroutinefunction):
+        if name.startswith('_') or name in exclude:
+            continue
+        setattr(obj, name, _timed(method, prefix + name, latency))
+    for name, method in inspect.getmembers(obj, inspect.isasyncgenfunction):
+        if name.startswith('_') or name in exclude:
+            continue
+        setattr(obj, name, _timed_gen(method, prefix + name, latency))
+
+
+def _timed(method, name: str, latency: Histogram):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            latency.observe(name, time.perf_counter() - start)
+    return wrapper
+
+
+def _timed_gen(method, name: str, latency: Histogram):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        agen = method(*args, **kwargs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = await agen.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    latency.observe(name, time.perf_counter() - start)
+                yield item
+        finally:
+            await agen.aclose()
+    return wrapper
@@ -0,0 +1,88 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from database import Database
+from ratelimit import SlidingWindow
+
+
+class UpdateDedupMiddleware(BaseMiddleware):
+    """Bir xil update_id li update faqat bir marta qayta ishlanadi
+
+    update_id processed_updates jadvaliga yoziladi; bir nechta jarayon bitta
+    webhook oqimini bo'lishganda ham kino ikki marta yuborilmaydi.
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+        self.skipped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        try:
+            claimed = await self.db.claim_update(event.update_id)
+        except Exception as e:
+            # Baza band bo'lsa ham update yo'qolmasin
+            logging.warning(f"Update dedup tekshiruvida xatolik: {e}")
+            claimed = True
+
+        if not claimed:
+            self.skipped += 1
+            return None
+        return await handler(event, data)
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Foydalanuvchi bo'yicha flood himoyasi (update darajasidagi outer middleware)
+
+    Faqat message va callback_query updatelari cheklanadi. Dedup va FSM middlewarelaridan
+    oldin ro'yxatdan o'tkaziladi: limitdan oshgan update jimgina tashlanadi va baza,
+    handler yoki Telegram API gacha yetib bormaydi. Callback tugmalari uchun `callbacks`
+    da alohida (qattiqroq) oyna berish mumkin; oynada birinchi rad etilgan bosishga qisqa
+    javob qaytariladi, qolganlari javobsiz qoladi. `exempt` dagi foydalanuvchilar
+    (adminlar) cheklanmaydi.
+    """
+
+    def __init__(self, default: SlidingWindow, callbacks: Dict[str, SlidingWindow] = None, exempt=()):
+        self.default = default
+        self.callbacks = callbacks or {}
+        self.exempt = exempt
+
+    @property
+    def dropped(self) -> int:
+        return self.default.rejected + sum(window.rejected for window in self.callbacks.values())
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = event.callback_query
+        message = event.message
+        if message is None and callback is None:
+            return await handler(event, data)
+        user = (message or callback).from_user
+        if user is None or user.id in self.exempt:
+            return await handler(event, data)
+
+        window = self.default
+        if callback is not None and callback.data:
+            window = self.callbacks.get(callback.data.split(':', 1)[0], self.default)
+
+        rejected = window.hit(user.id)
+        if not rejected:
+            return await handler(event, data)
+
+        if rejected == 1 and callback is not None:
+            try:
+                await callback.answer("⏳ Biroz kuting...")
+            except Exception as e:
+                logging.warning(f"Callbackga javob berishda xatolik: {e}")
+        return None
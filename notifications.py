@@ -0,0 +1,103 @@
+import asyncio
+import logging
+
+from aiogram import Bot
+
+from database import Database, utc_timestamp
+
+
+class NewUserDigest:
+    """Yangi foydalanuvchilar haqida adminlarga yig'ma xabar
+
+    /start bosilganda har bir admin uchun alohida xabar yuborilmaydi: foydalanuvchilar
+    navbatga yig'iladi va har `interval` soniyada (yoki `threshold` ta yig'ilganda)
+    har bir adminga bitta xabar ketadi: jami soni va birinchi `max_listed` tasi.
+    Bazada avvaldan bor (qaytgan) foydalanuvchilar yuborishdan oldin chiqarib tashlanadi.
+    """
+
+    def __init__(self, bot: Bot, db: Database, admin_ids, interval: float = 60,
+                 threshold: int = 1000, max_listed: int = 20):
+        self.bot = bot
+        self.db = db
+        self.admin_ids = admin_ids
+        self.interval = interval
+        self.threshold = threshold
+        self.max_listed = max_listed
+        self.received = 0
+        self.skipped = 0
+        self.sent = 0
+        self._users = {}
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flush_task = None
+
+    def add(self, user_id: int, username: str, full_name: str):
+        self.received += 1
+        if user_id in self._users:
+            self.skipped += 1
+            return
+        self._users[user_id] = (username, full_name, utc_timestamp())
+        if len(self._users) >= self.threshold and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    @property
+    def pending(self) -> int:
+        return len(self._users)
+
+    def _format(self, users: dict) -> str:
+        lines = [f"👤 Yangi foydalanuvchilar: <b>{len(users)}</b> ta\n"]
+        for user_id, (username, full_name, _) in list(users.items())[:self.max_listed]:
+            username = f"@{username}" if username else "Yo'q"
+            lines.append(f"🆔 {user_id} | {username} | {full_name}")
+        if len(users) > self.max_listed:
+            lines.append(f"\n... va yana {len(users) - self.max_listed} ta")
+        return "\n".join(lines)
+
+    async def _drop_returning(self, users: dict):
+        """/start dan oldin bazada bo'lgan foydalanuvchilarni olib tashlash"""
+        try:
+            joined_dates = await self.db.get_joined_dates(users)
+        except Exception as e:
+            logging.warning(f"Foydalanuvchilarni tekshirishda xatolik: {e}")
+            return
+        for user_id, joined_date in joined_dates.items():
+            if joined_date is None or joined_date < users[user_id][2]:
+                del users[user_id]
+                self.skipped += 1
+
+    async def flush(self):
+        async with self._lock:
+            if not self._users:
+                return
+
+            users, self._users = self._users, {}
+            await self._drop_returning(users)
+            if users:
+                await self._send(self._format(users))
+
+    async def _send(self, text: str):
+        for admin_id in list(self.admin_ids):
+            try:
+                await self.bot.send_message(admin_id, text, parse_mode="HTML")
+                self.sent += 1
+            except Exception as e:
+                logging.warning(f"Adminga xabar yuborishda xatolik: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import random
+import time
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import GetUpdates, Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+
+class TokenBucket:
+    """Oddiy token bucket: soniyasiga `rate` ta so'rov, `capacity` gacha portlash"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        """TelegramRetryAfter: belgilangan vaqtgacha hech kimga token berilmaydi"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def idle(self, now: float) -> bool:
+        """Bucket to'lgan va pauzada emas - uni o'chirib yuborsa bo'ladi"""
+        self._refill(now)
+        return self._tokens >= self.capacity and now >= self._paused_until
+
+    async def acquire(self) -> bool:
+        """Token olish; kutishga to'g'ri kelgan bo'lsa True"""
+        waited = False
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                waited = True
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return waited
+            waited = True
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SlidingWindow:
+    """Kalit (foydalanuvchi) bo'yicha `window` soniyada `limit` ta hodisa
+
+    Har bir kalit uchun timestamp ro'yxati emas, faqat 4 ta son saqlanadi:
+    [oyna raqami, joriy oynadagi son, oldingi oynadagi son, rad etilganlar].
+    Sliding window oldingi oyna sonini o'tgan vaqtga mutanosib kamaytirib taxmin qilinadi.
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.rejected = 0
+        self._state = {}
+
+    def hit(self, key, now: float = None) -> int:
+        """Hodisani hisobga olish
+
+        0 - ruxsat; aks holda shu oynada nechanchi marta rad etilgani (1 - birinchi marta).
+        Rad etilgan hodisalar limitga qo'shilmaydi.
+        """
+        if now is None:
+            now = time.monotonic()
+        window_id, offset = divmod(now, self.window)
+        state = self._state.get(key)
+        if state is None:
+            if len(self._state) >= self.max_keys:
+                self._evict(window_id)
+            state = self._state[key] = [window_id, 0, 0, 0]
+        elif state[0] != window_id:
+            state[2] = state[1] if state[0] == window_id - 1 else 0
+            state[0], state[1], state[3] = window_id, 0, 0
+
+        if state[2] * (1 - offset / self.window) + state[1] >= self.limit:
+            state[3] += 1
+            self.rejected += 1
+            return state[3]
+        state[1] += 1
+        return 0
+
+    def _evict(self, window_id: float):
+        # Oldingi oynadan beri jim bo'lganlar limitga ta'sir qilmaydi
+        for key in [key for key, state in self._state.items() if state[0] < window_id - 1]:
+            del self._state[key]
+
+        # Hammasi faol bo'lsa, eng eski yarmini o'chiramiz
+        if len(self._state) >= self.max_keys:
+            for key in list(self._state)[:len(self._state) // 2]:
+                del self._state[key]
+
+    @property
+    def size(self) -> int:
+        return len(self._state)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """Bot sessiyasidan chiqadigan so'rovlar uchun limit va qayta urinish
+
+    Xabar yuboradigan har bir so'rov umumiy (soniyasiga `global_rate`) va chatga
+    xos (soniyasiga `chat_rate`) token bucketdan o'tadi - limitdan oshsa xato
+    bermasdan navbat kutadi. Telegram limitlari xabar yuborishga tegishli, shuning
+    uchun getChatMember, answerCallbackQuery kabi so'rovlar cheklanmaydi.
+    TelegramRetryAfter da `retry_after` soniya, tarmoq va 5xx xatolarida jitterli
+    eksponensial kutishdan keyin qayta yuboriladi (barcha so'rovlar uchun). Xabar
+    yuborishda TelegramRetryAfter kelsa umumiy bucket ham to'xtatiladi - flood limit
+    tugaguncha hech bir chatga xabar ketmaydi.
+    """
+
+    # Long polling so'rovi o'z kutishiga ega, unga limit ham, qayta urinish ham kerak emas
+    exempt = (GetUpdates,)
+    # Limitlanadigan metodlar: chatga xabar yuboradiganlar
+    limited_prefixes = ('send', 'copy', 'forward')
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 max_attempts: int = 3, base_delay: float = 0.5, max_retry_after: float = 60,
+                 max_chat_buckets: int = 10_000):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_retry_after = max_retry_after
+        self.max_chat_buckets = max_chat_buckets
+        self.throttled = 0
+        self.retried = 0
+        self.dropped = 0
+        self._chat_buckets = {}
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_chat_buckets:
+                self._evict()
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _evict(self):
+        # Ommaviy xabarda har bir foydalanuvchi uchun bucket ochiladi - to'lib qolganlarini tashlaymiz
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.idle(now)]:
+            del self._chat_buckets[chat_id]
+
+    async def _acquire(self, chat_bucket: TokenBucket):
+        waited = await chat_bucket.acquire()
+        waited = await self.global_bucket.acquire() or waited
+        if waited:
+            self.throttled += 1
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, self.exempt):
+            return await make_request(bot, method)
+
+        chat_id = getattr(method, 'chat_id', None)
+        limited = chat_id is not None and method.__api_method__.startswith(self.limited_prefixes)
+        chat_bucket = self._chat_bucket(chat_id) if limited else None
+
+        for attempt in range(1, self.max_attempts + 1):
+            if limited:
+                await self._acquire(chat_bucket)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                delay = e.retry_after + random.uniform(0, 1)
+                if limited:
+                    # Flood limit butun botga tegishli: boshqa chatlarga (masalan, ommaviy xabar
+                    # workerlari) yuborilayotgan xabarlar ham kutadi - qayta urinilmasa ham
+                    self.global_bucket.pause(delay)
+                    chat_bucket.pause(delay)
+                if attempt == self.max_attempts or e.retry_after > self.max_retry_after:
+                    self.dropped += 1
+                    raise
+                logging.warning(f"{method.__api_method__}: flood limit, {e.retry_after} soniya kutiladi")
+                if not limited:
+                    await asyncio.sleep(delay)
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == self.max_attempts:
+                    self.dropped += 1
+                    raise
+                delay = random.uniform(0, self.base_delay * 2 ** attempt)
+                logging.warning(f"{method.__api_method__}: {e}, {delay:.1f} soniyadan keyin qayta urinish")
+                await asyncio.sleep(delay)
+            self.retried += 1
@@ -0,0 +1,93 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database import Database
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM holatlarini bot bazasidagi fsm_storage jadvalida saqlash
+
+    Bir nechta jarayon (yoki replika) bitta faylni ishlatganda ham admin
+    bosqichlari (AdminStates) buzilmaydi va bot qayta ishga tushganda
+    holatlar yo'qolmaydi. Yozuvlar `ttl` soniyadan keyin eskiradi.
+    """
+
+    def __init__(self, db: Database, ttl: int = 86400):
+        self.db = db
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{key.thread_id or ''}:{key.destiny}"
+
+    def _expires_at(self) -> float:
+        return time.time() + self.ttl
+
+    # Muddati o'tgan yozuv yo'q deb hisoblanadi: upsert uning eski holati yoki ma'lumotini qoldirmaydi
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        await self.db.execute('''
+            INSERT INTO fsm_storage (key, state, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                state = excluded.state,
+                data = CASE WHEN fsm_storage.expires_at > ? THEN fsm_storage.data END,
+                expires_at = excluded.expires_at
+        ''', (self._key(key), state, self._expires_at(), time.time()))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        row = await self.db.fetchone(
+            'SELECT state FROM fsm_storage WHERE key = ? AND expires_at > ?', (self._key(key), time.time())
+        )
+        return row[0] if row else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self.db.execute('''
+            INSERT INTO fsm_storage (key, data, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                data = excluded.data,
+                state = CASE WHEN fsm_storage.expires_at > ? THEN fsm_storage.state END,
+                expires_at = excluded.expires_at
+        ''', (self._key(key), json.dumps(data, ensure_ascii=False), self._expires_at(), time.time()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        row = await self.db.fetchone(
+            'SELECT data FROM fsm_storage WHERE key = ? AND expires_at > ?', (self._key(key), time.time())
+        )
+        return json.loads(row[0]) if row and row[0] else {}
+
+    @staticmethod
+    def _update_data(conn, key: str, data: Dict[str, Any], now: float, expires_at: float):
+        # O'qish va yozish bitta (BEGIN IMMEDIATE) tranzaksiyada - boshqa jarayon yozuvi yo'qolmaydi.
+        # aiogram shartnomasi - oddiy dict.update (ichki dictlar birlashtirilmaydi, None saqlanadi)
+        row = conn.execute(
+            'SELECT state, data FROM fsm_storage WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        state, current = (row[0], json.loads(row[1]) if row[1] else {}) if row else (None, {})
+        current.update(data)
+        conn.execute('''
+            INSERT INTO fsm_storage (key, state, data, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                state = excluded.state, data = excluded.data, expires_at = excluded.expires_at
+        ''', (key, state, json.dumps(current, ensure_ascii=False), expires_at))
+        return current
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.db.transaction(
+            self._update_data, self._key(key), dict(data), time.time(), self._expires_at()
+        )
+
+    async def cleanup(self) -> int:
+        """Eskirgan va bo'sh yozuvlarni o'chirish"""
+        _, deleted = await self.db.execute(
+            "DELETE FROM fsm_storage WHERE expires_at <= ? OR (state IS NULL AND COALESCE(data, '{}') = '{}')",
+            (time.time(),)
+        )
+        return deleted
+
+    async def close(self) -> None:
+        # Ulanish Database ga tegishli, u main() da yopiladi
+        pass